@@ -7,70 +7,145 @@ Version 2.0 with advanced security features
 
 import sys
 import os
-import locale
-import subprocess
-import argparse
-import json
-from pathlib import Path
+import functools
+from types import SimpleNamespace
+
+# argparse, json and subprocess are imported lazily in the branches that need
+# them: a bare `ai_chat` launch only has to pick a script and exec it
+
+# Plain string paths: these are only handed to os.* calls, so there is no
+# point paying for pathlib on every launch
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+CONFIG_DIR = os.path.expanduser("~/.ai_terminal_chat")
+LANGUAGE_CONFIG_FILE = os.path.join(CONFIG_DIR, "language_config.json")
+
+# Script per supported language, and what to try when it is not installed
+LANGUAGE_SCRIPTS = {"fr": "ai_chat_fr.py", "en": "ai_chat_en.py"}
+LANGUAGE_FALLBACKS = {
+    "fr": ("en", "❌ French version not found, falling back to English"),
+    "en": ("fr", "❌ English version not found, falling back to French"),
+}
 
 def get_config_dir():
     """Get the configuration directory"""
-    return Path.home() / ".ai_terminal_chat"
+    from pathlib import Path
+    return Path(CONFIG_DIR)
+
+def save_language_config(config):
+    """Write the launcher config file, raising OSError on failure"""
+    import json
+    # Serialize up front so the file is written with a single write() call
+    payload = json.dumps(config, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+    try:
+        try:
+            fd = os.open(LANGUAGE_CONFIG_FILE, flags, 0o644)
+        except FileNotFoundError:
+            # Only pay for mkdir on the very first save
+            os.makedirs(CONFIG_DIR, exist_ok=True)
+            fd = os.open(LANGUAGE_CONFIG_FILE, flags, 0o644)
+        try:
+            os.write(fd, payload)
+        finally:
+            os.close(fd)
+    finally:
+        # Drop the memoized value so the next read sees the new content
+        load_language_config.cache_clear()
+
+@functools.lru_cache(maxsize=1)
+def load_language_config():
+    """Load the launcher config file (empty dict if missing or invalid)"""
+    # Read the raw bytes in one go: no existence check, no text-mode codec
+    try:
+        fd = os.open(LANGUAGE_CONFIG_FILE, os.O_RDONLY)
+        try:
+            data = os.read(fd, 65536)
+        finally:
+            os.close(fd)
+    except OSError:
+        return {}
+    
+    import json
+    try:
+        config = json.loads(data)
+    except ValueError:
+        return {}
+    
+    return config if isinstance(config, dict) else {}
 
 def save_language_preference(lang):
     """Save the language preference to config file"""
-    config_dir = get_config_dir()
-    config_dir.mkdir(exist_ok=True)
+    if load_language_preference() == lang:
+        # Already saved, avoid rewriting an identical file
+        return
     
-    config_file = config_dir / "language_config.json"
-    config = {"preferred_language": lang}
+    config = dict(load_language_config())
+    config["preferred_language"] = lang
     
     try:
-        with open(config_file, 'w', encoding='utf-8') as f:
-            json.dump(config, f, ensure_ascii=False, indent=2)
+        save_language_config(config)
     except (OSError, PermissionError) as e:
         print(f"⚠️  Warning: Could not save language preference: {e}")
 
 def load_language_preference():
     """Load the saved language preference"""
-    config_file = get_config_dir() / "language_config.json"
-    
-    if config_file.exists():
-        try:
-            with open(config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                return config.get("preferred_language")
-        except (OSError, PermissionError, json.JSONDecodeError):
-            pass
+    return load_language_config().get("preferred_language")
+
+def get_available_scripts(script_dir):
+    """Return the set of LANGUAGE_SCRIPTS installed in script_dir
     
-    return None
+    The launcher only ever runs one of these, so checking them directly costs
+    one stat per language: no directory scan and nothing cached on disk.
+    """
+    return {
+        name for name in LANGUAGE_SCRIPTS.values()
+        if os.path.isfile(os.path.join(script_dir, name))
+    }
+
+def list_chat_scripts(script_dir):
+    """Return the ai_chat_*.py files found in script_dir (for error messages)"""
+    try:
+        return sorted(
+            entry.name for entry in os.scandir(script_dir)
+            if entry.name.startswith("ai_chat_") and entry.name.endswith(".py")
+        )
+    except OSError:
+        return []
 
+@functools.lru_cache(maxsize=1)
 def get_system_language():
     """Detect system language"""
-    try:
-        # Try to get locale from environment variables
-        lang = os.environ.get('LANG', '')
-        if lang.startswith('fr'):
-            return 'fr'
-        elif lang.startswith('en'):
-            return 'en'
-        
-        # Try locale module
-        try:
-            default_locale = locale.getdefaultlocale()[0]
-            if default_locale and default_locale.startswith('fr'):
-                return 'fr'
-            elif default_locale and default_locale.startswith('en'):
-                return 'en'
-        except Exception:
-            pass
-        
-        # Default to English if detection fails
-        return 'en'
-    except Exception:
-        return 'en'
+    # Read the locale variables directly, in POSIX precedence order,
+    # instead of going through the deprecated locale.getdefaultlocale()
+    for var in ('LC_ALL', 'LC_MESSAGES', 'LANG'):
+        prefix = os.environ.get(var, '')[:2]
+        if prefix in LANGUAGE_SCRIPTS:
+            return prefix
+    
+    # Default to English if detection fails
+    return 'en'
 
-def main():
+# Options handled by the launcher itself; anything else is forwarded as-is
+LAUNCHER_FLAGS = ("--lang", "--config", "--select-lang", "--reset-lang",
+                  "--secure-mode", "--version", "--help")
+
+def has_launcher_flag(argv):
+    """Check whether argv contains an option the launcher must parse"""
+    for arg in argv:
+        if arg == "--":
+            break
+        name = arg.split("=", 1)[0]
+        if name == "-h":
+            return True
+        # argparse accepts unambiguous prefixes like --sel for --select-lang
+        if name.startswith("--") and len(name) > 2 and any(flag.startswith(name) for flag in LAUNCHER_FLAGS):
+            return True
+    return False
+
+@functools.lru_cache(maxsize=1)
+def get_argument_parser():
+    """Build the launcher argument parser once per process"""
+    import argparse
     parser = argparse.ArgumentParser(description="AI Terminal Chat - Multilingual Terminal AI Assistant (Secure Edition)")
     parser.add_argument("--lang", choices=['fr', 'en'], help="Force language (fr/en)")
     parser.add_argument("--config", action="store_true", help="Reconfigure LLM")
@@ -78,19 +153,28 @@ def main():
     parser.add_argument("--reset-lang", action="store_true", help="Reset language preference")
     parser.add_argument("--secure-mode", action="store_true", help="Enable secure mode")
     parser.add_argument("--version", action="version", version="AI Terminal Chat 2.0 (Secure Edition)")
-    args, unknown_args = parser.parse_known_args()
+    return parser
+
+def parse_arguments():
+    """Parse launcher arguments, returning (args, unknown_args)"""
+    if not has_launcher_flag(sys.argv[1:]):
+        # Nothing for the launcher: forward everything and skip argparse entirely
+        return SimpleNamespace(lang=None, config=False, select_lang=False,
+                               reset_lang=False, secure_mode=False), sys.argv[1:]
     
-    script_dir = Path(__file__).parent
+    return get_argument_parser().parse_known_args()
+
+def main():
+    args, unknown_args = parse_arguments()
     
     # Reset language preference
     if args.reset_lang:
         try:
-            config_file = get_config_dir() / "language_config.json"
-            if config_file.exists():
-                config_file.unlink()
-                print("✅ Language preference reset. Will auto-detect on next run.")
-            else:
-                print("ℹ️  No language preference was set.")
+            os.unlink(LANGUAGE_CONFIG_FILE)
+            load_language_config.cache_clear()
+            print("✅ Language preference reset. Will auto-detect on next run.")
+        except FileNotFoundError:
+            print("ℹ️  No language preference was set.")
         except (OSError, PermissionError) as e:
             print(f"❌ Error resetting language preference: {e}")
         return
@@ -142,34 +226,46 @@ def main():
                 # Fall back to auto-detection
                 lang = get_system_language()
     
-    # Choose the appropriate script
-    if lang == 'fr':
-        script_path = script_dir / "ai_chat_fr.py"
-        if not script_path.exists():
-            print("❌ French version not found, falling back to English")
-            script_path = script_dir / "ai_chat_en.py"
-    else:
-        script_path = script_dir / "ai_chat_en.py"
-        if not script_path.exists():
-            print("❌ English version not found, falling back to French")
-            script_path = script_dir / "ai_chat_fr.py"
+    available = get_available_scripts(SCRIPT_DIR)
     
-    if not script_path.exists():
+    # Choose the appropriate script (unknown saved values default to English)
+    if lang not in LANGUAGE_SCRIPTS:
+        lang = 'en'
+    script_name = LANGUAGE_SCRIPTS[lang]
+    if script_name not in available:
+        fallback_lang, message = LANGUAGE_FALLBACKS[lang]
+        print(message)
+        script_name = LANGUAGE_SCRIPTS[fallback_lang]
+    
+    if script_name not in available:
         print("❌ No language version found!")
         print("📁 Available files:")
-        for f in script_dir.glob("ai_chat_*.py"):
-            print(f"   {f.name}")
+        for name in list_chat_scripts(SCRIPT_DIR):
+            print(f"   {name}")
         sys.exit(1)
     
+    script_path = os.path.join(SCRIPT_DIR, script_name)
+    
     # Prepare command arguments
-    cmd = [sys.executable, str(script_path)]
+    cmd = [sys.executable, script_path]
     if args.config:
         cmd.append("--config")
     if args.secure_mode:
         cmd.append("--secure-mode")
     cmd.extend(unknown_args)
     
+    # Replace the launcher process with the selected version; nothing runs
+    # after the child exits, so there is no need to keep this interpreter around
+    sys.stdout.flush()
+    sys.stderr.flush()
+    try:
+        os.execv(sys.executable, cmd)
+    except OSError:
+        # exec unavailable or failed, fall back to a child process
+        pass
+    
     # Execute the appropriate version
+    import subprocess
     try:
         result = subprocess.run(cmd)
         return result.returncode
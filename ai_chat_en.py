@@ -7,19 +7,45 @@ Secure Edition with encryption and validation
 
 import sys
 import json
-import requests
-import subprocess
 import argparse
 import getpass
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List
+import re
 import shutil
-from rich.console import Console
-from rich.markdown import Markdown
-from rich.panel import Panel
-from rich.prompt import Prompt
-from rich.table import Table
-import pyperclip
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# rich, requests and pyperclip are imported on first use so that
+# --help/--version and argument errors do not pay for them
+RICH_LOADED = False
+
+def load_rich():
+    """Import the rich UI classes into the module namespace"""
+    global RICH_LOADED, Console, Group, Live, Markdown, Panel, Prompt, Spinner, Table
+    if RICH_LOADED:
+        return
+    from rich.console import Console, Group
+    from rich.live import Live
+    from rich.markdown import Markdown
+    from rich.panel import Panel
+    from rich.prompt import Prompt
+    from rich.spinner import Spinner
+    from rich.table import Table
+    RICH_LOADED = True
+
+# Use orjson for (de)serialization when it is installed
+try:
+    import orjson
+    json_loads = orjson.loads
+    def json_dumps(obj: Any, indent: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+except ImportError:
+    json_loads = json.loads
+    def json_dumps(obj: Any, indent: bool = False) -> bytes:
+        return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False).encode('utf-8')
 
 # Import security utilities
 try:
@@ -31,6 +57,7 @@ except ImportError:
 
 def safe_prompt(prompt_text, **kwargs):
     """Safe prompt with keyboard interrupt and EOF handling"""
+    load_rich()
     try:
         return Prompt.ask(prompt_text, **kwargs)
     except KeyboardInterrupt:
@@ -53,9 +80,151 @@ def secure_password_prompt(prompt_text: str) -> str:
         print("\n\n⚠️  Input stream closed unexpectedly.")
         sys.exit(0)
 
+# Number of user/assistant exchanges kept as conversation context
+MAX_HISTORY_TURNS = 20
+
+# Number of answers kept by the optional response cache
+RESPONSE_CACHE_SIZE = 64
+
+# (connect, read) timeouts in seconds for requests to the LLM
+REQUEST_TIMEOUT = (5, 120)
+
+# Providers that accept an Idempotency-Key: only their chat POSTs are retried
+IDEMPOTENT_PROVIDERS = frozenset({"openai"})
+
+# Longest wait between two attempts, even if the server asks for more via Retry-After
+RETRY_AFTER_MAX_S = 10
+
+# Markdown constructs worth a full Markdown render (code fences, headings,
+# emphasis, lists); anything else is shown as plain text
+MARKDOWN_PATTERN = re.compile(r'(?m)(^```|^#{1,6} |\*\*|__|^\s*[-*+] |^\s*\d+\.\s)')
+
+# Menus of the configuration screens, built once at import time
+LLM_TYPES = {
+    "1": {"name": "Ollama (Local)", "type": "ollama"},
+    "2": {"name": "LM Studio (Local)", "type": "lmstudio"},
+    "3": {"name": "OpenAI API", "type": "openai"},
+    "4": {"name": "OpenRouter API", "type": "openrouter"},
+    "5": {"name": "Anthropic API", "type": "anthropic"},
+    "6": {"name": "Groq API", "type": "groq"}
+}
+
+OPENAI_MODELS = {
+    "1": "gpt-4o-mini (Recommended - Good value for code)",
+    "2": "gpt-4o (Most powerful)",
+    "3": "gpt-3.5-turbo (Cheapest)",
+    "4": "Other (manual entry)"
+}
+
+OPENROUTER_FREE_MODELS = {
+    "1": "microsoft/phi-4-reasoning-plus:free (Free - New! Excellent for code)",
+    "2": "google/gemma-2-9b-it:free (Free - General)",
+    "3": "meta-llama/llama-3.1-8b-instruct:free (Free - General)"
+}
+
+OPENROUTER_PAID_MODELS = {
+    "4": "anthropic/claude-3.5-sonnet (Paid - Excellent for code)",
+    "5": "openai/gpt-4o (Paid - Very good for code)",
+    "6": "google/gemini-pro-1.5 (Paid - Good for code)",
+    "7": "meta-llama/llama-3.1-70b-instruct (Paid - Good for code)",
+    "8": "Other (manual entry)"
+}
+
+OPENROUTER_MODELS = {**OPENROUTER_FREE_MODELS, **OPENROUTER_PAID_MODELS}
+
+ANTHROPIC_MODELS = {
+    "1": "claude-3-5-sonnet-20241022 (Recommended - Excellent for code)",
+    "2": "claude-3-5-haiku-20241022 (Fast and cheaper)",
+    "3": "claude-3-opus-20240229 (Most powerful)",
+    "4": "Other (manual entry)"
+}
+
+GROQ_MODELS = {
+    "1": "llama-3.1-70b-versatile (Free - Excellent for code)",
+    "2": "llama-3.1-8b-instant (Free - Very fast)",
+    "3": "mixtral-8x7b-32768 (Free - Good for code)",
+    "4": "Other (manual entry)"
+}
+
+# Prompt choices for each menu
+LLM_TYPE_CHOICES = list(LLM_TYPES)
+OPENAI_MODEL_CHOICES = list(OPENAI_MODELS)
+OPENROUTER_MODEL_CHOICES = list(OPENROUTER_MODELS)
+ANTHROPIC_MODEL_CHOICES = list(ANTHROPIC_MODELS)
+GROQ_MODEL_CHOICES = list(GROQ_MODELS)
+
+# Parsed config.json per path, as (mtime_ns, config)
+_CONFIG_CACHE: Dict[Path, tuple] = {}
+
+def iter_sse_events(response: "requests.Response") -> Iterator[Dict[str, Any]]:
+    """Yield the JSON payload of each server-sent event of a streamed response"""
+    for line in response.iter_lines():
+        # Skip keep-alive blank lines, comments and "event:" lines
+        if not line.startswith(b"data:"):
+            continue
+        payload = line[5:].strip()
+        if payload == b"[DONE]":
+            break
+        yield json_loads(payload)
+
+def iter_chat_deltas(response: "requests.Response") -> Iterator[str]:
+    """Yield the text deltas of a streamed OpenAI-style chat completion"""
+    for chunk in iter_sse_events(response):
+        choices = chunk.get("choices")
+        if choices:
+            content = choices[0].get("delta", {}).get("content")
+            if content:
+                yield content
+
+def create_retry(retry_posts: bool = False) -> "Retry":
+    """Retry policy for 502/503/504, covering POST only when retry_posts is set
+    
+    Once the retries are used up the last response is returned as is, so
+    raise_for_status still reports the provider's error. A read timeout is
+    never replayed: the LLM may already be working on the request.
+    """
+    from urllib3.util.retry import Retry
+    
+    class CappedRetry(Retry):
+        def get_retry_after(self, response):
+            retry_after = super().get_retry_after(response)
+            return None if retry_after is None else min(retry_after, RETRY_AFTER_MAX_S)
+    
+    allowed_methods = Retry.DEFAULT_ALLOWED_METHODS
+    if retry_posts:
+        allowed_methods = allowed_methods | {"POST"}
+    return CappedRetry(
+        total=2,
+        read=False,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=allowed_methods,
+        raise_on_status=False
+    )
+
+def create_http_session() -> "requests.Session":
+    """Create an HTTP session that keeps connections to the LLM alive between turns"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    
+    session = requests.Session()
+    # Chat POSTs are not replayed here: a 502/504 may come from a gateway after the
+    # provider accepted the request. See AITerminalChat.mount_provider_retries
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=create_retry())
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 class AITerminalChat:
     def __init__(self, secure_mode: bool = False):
+        load_rich()
         self.console = Console()
+        self.session = create_http_session()
+        self.ollama_models = {}
+        self.history: List[Dict[str, Any]] = []
+        # LRU of answers, only used when "cache_responses" is enabled in the config
+        self.response_cache: "OrderedDict[tuple, str]" = OrderedDict()
+        self.response_cache_lock = threading.Lock()
         self.config_dir = Path.home() / ".ai_terminal_chat"
         self.config_file = self.config_dir / "config.json"
         self.secure_mode = secure_mode
@@ -69,6 +238,53 @@ class AITerminalChat:
             self.secure_config_manager = None
         
         self.config = self.load_config()
+        self.update_request_settings()
+    
+    def update_request_settings(self):
+        """Prepare per-provider endpoint, headers and payload once instead of on every message"""
+        llm_type = self.config.get("llm_type")
+        api_url = self.config.get("api_url", "")
+        api_key = self.config.get("api_key")
+        model = self.config.get("model")
+        
+        if llm_type == "anthropic":
+            self.headers = {
+                "x-api-key": api_key,
+                "anthropic-version": "2023-06-01",
+                "content-type": "application/json"
+            }
+        elif llm_type == "openrouter":
+            self.headers = {
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            }
+        elif llm_type in ["openai", "groq"]:
+            self.headers = {"Authorization": f"Bearer {api_key}"}
+        else:
+            self.headers = {}
+        
+        # Each message only has to add its "messages" to this template
+        if llm_type == "ollama":
+            self.endpoint = f"{api_url}/api/chat"
+            self.payload = {"model": model, "stream": True}
+        elif llm_type == "lmstudio":
+            self.endpoint = f"{api_url}/v1/chat/completions"
+            self.payload = {"model": model, "temperature": 0.7, "stream": True}
+        elif llm_type == "anthropic":
+            self.endpoint = f"{api_url}/messages"
+            self.payload = {"model": model, "max_tokens": 4096, "stream": True}
+        else:
+            self.endpoint = f"{api_url}/chat/completions"
+            self.payload = {"model": model, "temperature": 0.7, "stream": True}
+        
+        self.mount_provider_retries()
+    
+    def mount_provider_retries(self):
+        """Also retry chat POSTs to the configured provider if it honours Idempotency-Key"""
+        if self.config.get("llm_type") in IDEMPOTENT_PROVIDERS and self.config.get("api_url"):
+            from requests.adapters import HTTPAdapter
+            adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=create_retry(retry_posts=True))
+            self.session.mount(self.config["api_url"], adapter)
         
     def validate_user_input(self, user_input: str) -> bool:
         """Validate user input for security"""
@@ -87,16 +303,25 @@ class AITerminalChat:
         if not self.config_dir.exists():
             self.config_dir.mkdir(parents=True)
             
-        if not self.config_file.exists():
+        try:
+            mtime = self.config_file.stat().st_mtime_ns
+        except FileNotFoundError:
             return self.setup_initial_config()
         
+        # Reuse the parsed config as long as the file has not changed on disk
+        cached = _CONFIG_CACHE.get(self.config_file)
+        if cached and cached[0] == mtime:
+            return dict(cached[1])
+        
         try:
             with open(self.config_file, 'r') as f:
                 content = f.read().strip()
                 if not content:  # Empty file
                     self.console.print("[bold]Empty configuration file, creating new configuration...[/bold]")
                     return self.setup_initial_config()
-                return json.loads(content)
+                config = json_loads(content)
+            _CONFIG_CACHE[self.config_file] = (mtime, config)
+            return dict(config)
         except (json.JSONDecodeError, FileNotFoundError) as e:
             self.console.print(f"[bold]Corrupted configuration file ({e}), creating new configuration...[/bold]")
             # Backup old corrupted file
@@ -112,44 +337,36 @@ class AITerminalChat:
     def save_config(self):
         """Save configuration"""
         try:
-            with open(self.config_file, 'w') as f:
-                json.dump(self.config, f, indent=2)
+            with open(self.config_file, 'wb') as f:
+                f.write(json_dumps(self.config, indent=True))
+            _CONFIG_CACHE[self.config_file] = (self.config_file.stat().st_mtime_ns, dict(self.config))
         except Exception as e:
             self.console.print(f"[bold]Error saving configuration: {e}[/bold]")
     
     def setup_initial_config(self) -> Dict[str, Any]:
         """Interactive initial configuration"""
-        self.console.print(Panel.fit("🤖 AI Terminal Chat Initial Configuration", style="bold"))
-        
-        # Available LLM types
-        llm_types = {
-            "1": {"name": "Ollama (Local)", "type": "ollama"},
-            "2": {"name": "LM Studio (Local)", "type": "lmstudio"},
-            "3": {"name": "OpenAI API", "type": "openai"},
-            "4": {"name": "OpenRouter API", "type": "openrouter"},
-            "5": {"name": "Anthropic API", "type": "anthropic"},
-            "6": {"name": "Groq API", "type": "groq"}
-        }
-        
         # Display options
         table = Table(title="Available LLM Types")
         table.add_column("Option", style="bold")
         table.add_column("Description", style="default")
         table.add_column("Type", style="dim")
         
-        for key, value in llm_types.items():
+        for key, value in LLM_TYPES.items():
             table.add_row(key, value["name"], value["type"])
         
-        self.console.print(table)
+        self.console.print(Group(
+            Panel.fit("🤖 AI Terminal Chat Initial Configuration", style="bold"),
+            table
+        ))
         
         try:
-            choice = safe_prompt("Choose your LLM type", choices=list(llm_types.keys()))
+            choice = safe_prompt("Choose your LLM type", choices=LLM_TYPE_CHOICES)
         except KeyboardInterrupt:
             print("\n\n⚠️  Configuration cancelled by user.")
             print("💡 You can restart configuration later with: chat --config")
             sys.exit(0)
         
-        selected_llm = llm_types[choice]
+        selected_llm = LLM_TYPES[choice]
         
         config = {
             "llm_type": selected_llm["type"],
@@ -170,35 +387,61 @@ class AITerminalChat:
         elif selected_llm["type"] == "groq":
             config.update(self.setup_groq())
         
+        # Assign the config before saving it
+        self.config = config
         self.save_config()
-        with open(self.config_file, 'w') as f:
-            json.dump(config, f, indent=2)
         
         return config
     
+    def get_ollama_models(self, url: str):
+        """Return the models served by Ollama at url, or None if it is unreachable"""
+        if url not in self.ollama_models:
+            import requests
+            try:
+                response = self.session.get(f"{url}/api/tags", timeout=2)
+                response.raise_for_status()
+                self.ollama_models[url] = response.json().get("models", [])
+            except (requests.exceptions.RequestException, ValueError):
+                return None
+        return self.ollama_models[url]
+    
     def setup_ollama(self) -> Dict[str, Any]:
         """Configure Ollama"""
         self.console.print("[bold]Ollama Configuration[/bold]")
         
-        # Check if Ollama is installed
-        if not shutil.which("ollama"):
-            self.console.print("[bold]Ollama is not installed. Install it from https://ollama.ai[/bold]")
-            return {"error": "Ollama not found"}
+        url = safe_prompt("Ollama URL", default="http://localhost:11434")
         
-        # List available models
-        try:
-            result = subprocess.run(["ollama", "list"], capture_output=True, text=True)
-            if result.stdout.strip():
-                self.console.print("[bold]Available Ollama models:[/bold]")
-                self.console.print(result.stdout)
-            else:
-                self.console.print("[dim]No Ollama models found.[/dim]")
-                self.console.print("Download a model with: ollama pull llama2")
-        except Exception:
-            pass
+        # List available models through the Ollama API
+        models = self.get_ollama_models(url)
+        if models is None:
+            # Check if Ollama is installed
+            if not shutil.which("ollama"):
+                self.console.print("[bold]Ollama is not installed. Install it from https://ollama.ai[/bold]")
+                return {"error": "Ollama not found"}
+            self.console.print(f"[dim]Could not reach Ollama at {url}. Start it with: ollama serve[/dim]")
+            # Fall back to the CLI, which may still know the local models
+            import subprocess
+            try:
+                result = subprocess.run(["ollama", "list"], capture_output=True, text=True, timeout=10)
+                if result.stdout.strip():
+                    self.console.print(Group("[bold]Available Ollama models:[/bold]", result.stdout))
+            except Exception:
+                pass
+        elif models:
+            table = Table(title="Available Ollama models")
+            table.add_column("Model", style="bold")
+            table.add_column("Size", style="dim")
+            
+            for entry in models:
+                size = entry.get("size")
+                table.add_row(entry.get("name", "?"), f"{size / 1e9:.1f} GB" if size else "")
+            
+            self.console.print(table)
+        else:
+            self.console.print("[dim]No Ollama models found.[/dim]")
+            self.console.print("Download a model with: ollama pull llama2")
         
         model = safe_prompt("Enter model name (e.g., llama2, codellama)")
-        url = safe_prompt("Ollama URL", default="http://localhost:11434")
         
         return {
             "model": model,
@@ -221,30 +464,21 @@ class AITerminalChat:
     
     def setup_openai(self) -> Dict[str, Any]:
         """Configure OpenAI"""
-        self.console.print("[bold]OpenAI Configuration[/bold]")
-        
-        models = {
-            "1": "gpt-4o-mini (Recommended - Good value for code)",
-            "2": "gpt-4o (Most powerful)",
-            "3": "gpt-3.5-turbo (Cheapest)",
-            "4": "Other (manual entry)"
-        }
-        
         table = Table(title="OpenAI Models")
         table.add_column("Option", style="bold")
         table.add_column("Model", style="default")
         
-        for key, value in models.items():
+        for key, value in OPENAI_MODELS.items():
             table.add_row(key, value)
         
-        self.console.print(table)
+        self.console.print(Group("[bold]OpenAI Configuration[/bold]", table))
         
-        choice = safe_prompt("Choose a model", choices=list(models.keys()))
+        choice = safe_prompt("Choose a model", choices=OPENAI_MODEL_CHOICES)
         
         if choice == "4":
             model = safe_prompt("Enter model name")
         else:
-            model = models[choice].split(" ")[0]
+            model = OPENAI_MODELS[choice].split(" ")[0]
         
         api_key = safe_prompt("OpenAI API Key", password=True)
         
@@ -256,50 +490,30 @@ class AITerminalChat:
     
     def setup_openrouter(self) -> Dict[str, Any]:
         """Configure OpenRouter"""
-        self.console.print("[bold]OpenRouter Configuration[/bold]")
-        
-        # Free and paid models
-        free_models = {
-            "1": "microsoft/phi-4-reasoning-plus:free (Free - New! Excellent for code)",
-            "2": "google/gemma-2-9b-it:free (Free - General)",
-            "3": "meta-llama/llama-3.1-8b-instruct:free (Free - General)"
-        }
-        
-        paid_models = {
-            "4": "anthropic/claude-3.5-sonnet (Paid - Excellent for code)",
-            "5": "openai/gpt-4o (Paid - Very good for code)",
-            "6": "google/gemini-pro-1.5 (Paid - Good for code)",
-            "7": "meta-llama/llama-3.1-70b-instruct (Paid - Good for code)",
-            "8": "Other (manual entry)"
-        }
-        
         # Display free models
         table_free = Table(title="FREE OpenRouter Models")
         table_free.add_column("Option", style="bold")
         table_free.add_column("Model", style="default")
         
-        for key, value in free_models.items():
+        for key, value in OPENROUTER_FREE_MODELS.items():
             table_free.add_row(key, value)
         
-        self.console.print(table_free)
-        
         # Display paid models
         table_paid = Table(title="PAID OpenRouter Models (Better Performance)")
         table_paid.add_column("Option", style="bold")
         table_paid.add_column("Model", style="dim")
         
-        for key, value in paid_models.items():
+        for key, value in OPENROUTER_PAID_MODELS.items():
             table_paid.add_row(key, value)
         
-        self.console.print(table_paid)
+        self.console.print(Group("[bold]OpenRouter Configuration[/bold]", table_free, table_paid))
         
-        all_models = {**free_models, **paid_models}
-        choice = safe_prompt("Choose a model", choices=list(all_models.keys()))
+        choice = safe_prompt("Choose a model", choices=OPENROUTER_MODEL_CHOICES)
         
         if choice == "8":
             model = safe_prompt("Enter model name")
         else:
-            model = all_models[choice].split(" ")[0]
+            model = OPENROUTER_MODELS[choice].split(" ")[0]
         
         api_key = safe_prompt("OpenRouter API Key", password=True)
         
@@ -311,30 +525,21 @@ class AITerminalChat:
     
     def setup_anthropic(self) -> Dict[str, Any]:
         """Configure Anthropic"""
-        self.console.print("[bold]Anthropic Configuration[/bold]")
-        
-        models = {
-            "1": "claude-3-5-sonnet-20241022 (Recommended - Excellent for code)",
-            "2": "claude-3-5-haiku-20241022 (Fast and cheaper)",
-            "3": "claude-3-opus-20240229 (Most powerful)",
-            "4": "Other (manual entry)"
-        }
-        
         table = Table(title="Anthropic Models")
         table.add_column("Option", style="bold")
         table.add_column("Model", style="default")
         
-        for key, value in models.items():
+        for key, value in ANTHROPIC_MODELS.items():
             table.add_row(key, value)
         
-        self.console.print(table)
+        self.console.print(Group("[bold]Anthropic Configuration[/bold]", table))
         
-        choice = safe_prompt("Choose a model", choices=list(models.keys()))
+        choice = safe_prompt("Choose a model", choices=ANTHROPIC_MODEL_CHOICES)
         
         if choice == "4":
             model = safe_prompt("Enter model name")
         else:
-            model = models[choice].split(" ")[0]
+            model = ANTHROPIC_MODELS[choice].split(" ")[0]
         
         api_key = safe_prompt("Anthropic API Key", password=True)
         
@@ -346,30 +551,21 @@ class AITerminalChat:
     
     def setup_groq(self) -> Dict[str, Any]:
         """Configure Groq"""
-        self.console.print("[bold]Groq Configuration[/bold]")
-        
-        models = {
-            "1": "llama-3.1-70b-versatile (Free - Excellent for code)",
-            "2": "llama-3.1-8b-instant (Free - Very fast)",
-            "3": "mixtral-8x7b-32768 (Free - Good for code)",
-            "4": "Other (manual entry)"
-        }
-        
         table = Table(title="Groq Models (Free API with limits)")
         table.add_column("Option", style="bold")
         table.add_column("Model", style="default")
         
-        for key, value in models.items():
+        for key, value in GROQ_MODELS.items():
             table.add_row(key, value)
         
-        self.console.print(table)
+        self.console.print(Group("[bold]Groq Configuration[/bold]", table))
         
-        choice = safe_prompt("Choose a model", choices=list(models.keys()))
+        choice = safe_prompt("Choose a model", choices=GROQ_MODEL_CHOICES)
         
         if choice == "4":
             model = safe_prompt("Enter model name")
         else:
-            model = models[choice].split(" ")[0]
+            model = GROQ_MODELS[choice].split(" ")[0]
         
         api_key = safe_prompt("Groq API Key", password=True)
         
@@ -379,102 +575,174 @@ class AITerminalChat:
             "api_key": api_key
         }
     
-    def send_message(self, message: str) -> str:
+    def send_message(self, message: str, remember: bool = True) -> str:
         """Send message to configured LLM"""
+        return "".join(self.stream_message(message, remember))
+    
+    def send_many(self, messages: List[str], max_workers: int = 4) -> List[str]:
+        """Send several independent messages concurrently, returning answers in order
+        
+        Requests overlap on the pooled session, so the total time is close to
+        the slowest answer rather than the sum of all of them. The messages are
+        sent without the conversation history and are not added to it.
+        """
+        if not messages:
+            return []
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(messages))) as executor:
+            return list(executor.map(lambda message: self.send_message(message, remember=False), messages))
+    
+    def stream_message(self, message: str, remember: bool = True) -> Iterator[str]:
+        """Send message to configured LLM, yielding the response as it arrives
+        
+        With remember=True the previous turns are sent along and the exchange
+        is appended to the history once the answer completes successfully.
+        """
+        user_message = {"role": "user", "content": message}
+        messages = self.history + [user_message] if remember else [user_message]
+        
+        # Identical requests can be answered from the cache when enabled
+        cache_key = None
+        if self.config.get("cache_responses"):
+            cache_key = (
+                self.config["llm_type"],
+                self.config["model"],
+                tuple((m["role"], m["content"]) for m in messages)
+            )
+            with self.response_cache_lock:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    self.response_cache.move_to_end(cache_key)
+            if cached is not None:
+                yield cached
+                if remember:
+                    self.remember_exchange(user_message, cached)
+                return
+        
+        import requests
+        
+        parts = []
         try:
             if self.config["llm_type"] == "ollama":
-                return self.send_ollama(message)
+                sender = self.send_ollama
             elif self.config["llm_type"] == "lmstudio":
-                return self.send_lmstudio(message)
+                sender = self.send_lmstudio
             elif self.config["llm_type"] in ["openai", "anthropic", "groq"]:
-                return self.send_openai_compatible(message)
+                sender = self.send_openai_compatible
             elif self.config["llm_type"] == "openrouter":
-                return self.send_openrouter(message)
+                sender = self.send_openrouter
             else:
-                return "Error: Unknown LLM type"
+                yield "Error: Unknown LLM type"
+                return
+            
+            for chunk in sender(messages):
+                parts.append(chunk)
+                yield chunk
+        except requests.exceptions.RequestException as e:
+            # A stream that stalls mid-answer surfaces as a ConnectionError
+            # wrapping urllib3's ReadTimeoutError rather than as a Timeout
+            from urllib3.exceptions import ReadTimeoutError
+            if isinstance(e, requests.exceptions.Timeout) or any(
+                isinstance(arg, ReadTimeoutError) or isinstance(getattr(arg, "reason", None), ReadTimeoutError)
+                for arg in e.args
+            ):
+                yield "Error: The LLM did not respond in time, please try again"
+            else:
+                yield f"Error: {str(e)}"
+            return
         except Exception as e:
-            return f"Error: {str(e)}"
+            yield f"Error: {str(e)}"
+            return
+        
+        response = "".join(parts)
+        if cache_key is not None:
+            with self.response_cache_lock:
+                self.response_cache[cache_key] = response
+                if len(self.response_cache) > RESPONSE_CACHE_SIZE:
+                    self.response_cache.popitem(last=False)
+        if remember:
+            self.remember_exchange(user_message, response)
+    
+    def remember_exchange(self, user_message: Dict[str, Any], response: str):
+        """Append a completed exchange to the bounded conversation history"""
+        self.history.append(user_message)
+        self.history.append({"role": "assistant", "content": response})
+        # Keep the context bounded to the most recent turns
+        del self.history[:-2 * MAX_HISTORY_TURNS]
     
-    def send_ollama(self, message: str) -> str:
+    def send_ollama(self, messages: List[Dict[str, Any]]) -> Iterator[str]:
         """Send message to Ollama"""
-        url = f"{self.config['api_url']}/api/generate"
-        data = {
-            "model": self.config["model"],
-            "prompt": message,
-            "stream": False
-        }
-        response = requests.post(url, json=data)
-        response.raise_for_status()
-        return response.json()["response"]
+        data = dict(self.payload, messages=messages)
+        with self.session.post(self.endpoint, json=data, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            # Ollama streams one JSON object per line
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json_loads(line)
+                content = chunk.get("message", {}).get("content")
+                if content:
+                    yield content
+                if chunk.get("done"):
+                    break
     
-    def send_lmstudio(self, message: str) -> str:
+    def send_lmstudio(self, messages: List[Dict[str, Any]]) -> Iterator[str]:
         """Send message to LM Studio"""
-        url = f"{self.config['api_url']}/v1/chat/completions"
-        data = {
-            "model": self.config["model"],
-            "messages": [{"role": "user", "content": message}],
-            "temperature": 0.7
-        }
-        response = requests.post(url, json=data)
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"]
+        data = dict(self.payload, messages=messages)
+        with self.session.post(self.endpoint, json=data, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            yield from iter_chat_deltas(response)
     
-    def send_openai_compatible(self, message: str) -> str:
+    def send_openai_compatible(self, messages: List[Dict[str, Any]]) -> Iterator[str]:
         """Send message to OpenAI-compatible API (OpenAI, Anthropic, Groq)"""
-        url = f"{self.config['api_url']}/chat/completions"
-        headers = {"Authorization": f"Bearer {self.config['api_key']}"}
-        
         # Special handling for Anthropic
         if self.config["llm_type"] == "anthropic":
-            url = f"{self.config['api_url']}/messages"
-            headers = {
-                "x-api-key": self.config['api_key'],
-                "anthropic-version": "2023-06-01",
-                "content-type": "application/json"
-            }
-            data = {
-                "model": self.config["model"],
-                "max_tokens": 4096,
-                "messages": [{"role": "user", "content": message}]
+            # Mark the newest turn as a cache breakpoint so the next request
+            # can reuse the whole conversation prefix
+            last = messages[-1]
+            cached_turn = {
+                "role": last["role"],
+                "content": [{"type": "text", "text": last["content"], "cache_control": {"type": "ephemeral"}}]
             }
+            data = dict(self.payload, messages=messages[:-1] + [cached_turn])
         else:
-            data = {
-                "model": self.config["model"],
-                "messages": [{"role": "user", "content": message}],
-                "temperature": 0.7
-            }
+            data = dict(self.payload, messages=messages)
         
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
+        headers = self.headers
+        if self.config["llm_type"] in IDEMPOTENT_PROVIDERS:
+            # Same key for every attempt, so the provider can drop a duplicate
+            headers = dict(headers, **{"Idempotency-Key": str(uuid.uuid4())})
         
-        if self.config["llm_type"] == "anthropic":
-            return response.json()["content"][0]["text"]
-        else:
-            return response.json()["choices"][0]["message"]["content"]
+        with self.session.post(self.endpoint, headers=headers, json=data, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            
+            if self.config["llm_type"] == "anthropic":
+                for event in iter_sse_events(response):
+                    if event.get("type") == "content_block_delta":
+                        text = event.get("delta", {}).get("text")
+                        if text:
+                            yield text
+                    elif event.get("type") == "message_stop":
+                        break
+                    elif event.get("type") == "error":
+                        raise RuntimeError(event.get("error", {}).get("message", "stream error"))
+            else:
+                yield from iter_chat_deltas(response)
     
-    def send_openrouter(self, message: str) -> str:
+    def send_openrouter(self, messages: List[Dict[str, Any]]) -> Iterator[str]:
         """Send message to OpenRouter"""
-        url = f"{self.config['api_url']}/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.config['api_key']}",
-            "Content-Type": "application/json"
-        }
-        data = {
-            "model": self.config["model"],
-            "messages": [{"role": "user", "content": message}],
-            "temperature": 0.7
-        }
+        data = dict(self.payload, messages=messages)
         
-        # Use data=json.dumps(data) for OpenRouter compatibility
-        response = requests.post(url, headers=headers, data=json.dumps(data))
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"]
+        # Send a pre-encoded body for OpenRouter compatibility
+        with self.session.post(self.endpoint, headers=self.headers, data=json_dumps(data), stream=True, timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            yield from iter_chat_deltas(response)
     
     def format_response(self, response: str):
         """Format and display AI response"""
         try:
-            # Code detection in response
-            if "```" in response:
+            # Only pay for the Markdown parser when the response uses markdown
+            if MARKDOWN_PATTERN.search(response):
                 self.console.print(Markdown(response))
             else:
                 # Simple display if no markdown
@@ -506,6 +774,7 @@ class AITerminalChat:
                 elif user_input.lower() == 'copy':
                     if last_response:
                         try:
+                            import pyperclip
                             pyperclip.copy(last_response)
                             self.console.print("[bold]✓ Response copied to clipboard[/bold]")
                         except Exception:
@@ -515,11 +784,22 @@ class AITerminalChat:
                     continue
                 elif user_input.lower() == 'config':
                     self.config = self.setup_initial_config()
+                    self.update_request_settings()
                     continue
                 
-                # Loading indicator
-                with self.console.status("[bold]🤔 Thinking..."):
-                    response = self.send_message(user_input)
+                # Stream the answer, with a spinner until the first token arrives
+                parts = []
+                last_render = 0.0
+                with Live(Spinner("dots", text="[bold]🤔 Thinking..."), console=self.console,
+                          refresh_per_second=10, transient=True) as live:
+                    for chunk in self.stream_message(user_input):
+                        parts.append(chunk)
+                        # Re-parsing the markdown on every token is quadratic, render at the refresh rate
+                        now = time.monotonic()
+                        if now - last_render >= 0.1:
+                            live.update(Markdown("".join(parts)))
+                            last_render = now
+                response = "".join(parts)
                 
                 last_response = response
                 self.format_response(response)
@@ -529,10 +809,37 @@ class AITerminalChat:
         except Exception as e:
             self.console.print(f"[bold]Error: {e}[/bold]")
 
+def run_batch(chat: AITerminalChat, path: str, workers: int):
+    """Send the questions of a file (one per line) concurrently and print the answers"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            prompts = [line.strip() for line in f if line.strip()]
+    except OSError as e:
+        print(f"❌ Cannot read {path}: {e}")
+        sys.exit(1)
+    
+    responses = chat.send_many(prompts, max_workers=workers)
+    
+    for prompt, response in zip(prompts, responses):
+        chat.console.print(f"\n[bold]You:[/bold] {prompt}")
+        chat.format_response(response)
+
+def positive_int(value: str) -> int:
+    """Argparse type for options that need a whole number of at least 1"""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value!r}")
+    return number
+
 def main():
     parser = argparse.ArgumentParser(description="AI Terminal Chat - Terminal AI Assistant (Secure Edition)")
     parser.add_argument("--config", action="store_true", help="Reconfigure LLM")
     parser.add_argument("--secure-mode", action="store_true", help="Enable secure mode")
+    parser.add_argument("--batch", metavar="FILE", help="Send each line of the file as an independent question")
+    parser.add_argument("--workers", type=positive_int, default=4, help="Number of concurrent requests with --batch (default: 4)")
     parser.add_argument("--version", action="version", version="AI Terminal Chat 2.0 (Secure Edition)")
     args = parser.parse_args()
     
@@ -553,6 +860,11 @@ def main():
         
         if args.config:
             chat.config = chat.setup_initial_config()
+            chat.update_request_settings()
+        
+        if args.batch:
+            run_batch(chat, args.batch, args.workers)
+            return
         
         chat.start_chat()
         
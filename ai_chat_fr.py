@@ -6,20 +6,46 @@ Version sécurisée avec chiffrement et validation
 """
 
 import sys
+import os
 import json
-import requests
-import subprocess
+import functools
 import argparse
 import getpass
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List
 import shutil
-from rich.console import Console
-from rich.markdown import Markdown
-from rich.panel import Panel
-from rich.prompt import Prompt
-from rich.table import Table
-import pyperclip
+import threading
+import time
+import uuid
+
+# rich, requests, subprocess et pyperclip sont importés à la première utilisation
+# pour que --help/--version et les erreurs d'arguments n'en paient pas le coût
+RICH_LOADED = False
+
+def load_rich():
+    """Importe les classes d'interface de rich dans l'espace de noms du module"""
+    global RICH_LOADED, Console, Live, Markdown, Panel, Prompt, Spinner, Table
+    if RICH_LOADED:
+        return
+    from rich.console import Console
+    from rich.live import Live
+    from rich.markdown import Markdown
+    from rich.panel import Panel
+    from rich.prompt import Prompt
+    from rich.spinner import Spinner
+    from rich.table import Table
+    RICH_LOADED = True
+
+# Utiliser orjson pour la (dé)sérialisation s'il est installé
+try:
+    import orjson
+    json_loads = orjson.loads
+    def json_dumps(obj: Any, indent: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+except ImportError:
+    json_loads = json.loads
+    def json_dumps(obj: Any, indent: bool = False) -> bytes:
+        return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False).encode('utf-8')
 
 # Import security utilities
 try:
@@ -31,6 +57,7 @@ except ImportError:
 
 def safe_prompt(prompt_text, **kwargs):
     """Prompt sécurisé avec gestion des interruptions clavier et EOF"""
+    load_rich()
     try:
         return Prompt.ask(prompt_text, **kwargs)
     except KeyboardInterrupt:
@@ -53,9 +80,209 @@ def secure_password_prompt(prompt_text: str) -> str:
         print("\n\n⚠️  Flux d'entrée fermé de manière inattendue.")
         sys.exit(0)
 
+# Taille maximale, en caractères, de l'historique de conversation renvoyé au LLM
+MAX_HISTORY_CHARS = 32000
+
+# Réglages de génération par défaut, surchargés par la section "generation" de la
+# configuration puis par la ligne de commande
+DEFAULT_GENERATION = {"max_tokens": 4096, "temperature": 0.7, "top_p": 1.0, "timeout_s": 120}
+
+# Nom des réglages de génération dans les options d'Ollama
+OLLAMA_OPTION_NAMES = {"max_tokens": "num_predict", "temperature": "temperature", "top_p": "top_p"}
+
+# Consigne ajoutée en tête des questions regroupées par send_marshalled
+MARSHAL_INSTRUCTIONS = (
+    "Réponds à chacune des questions numérotées ci-dessous, indépendamment les unes des autres. "
+    'Renvoie uniquement un objet JSON de la forme {"answers": [{"id": 1, "text": "..."}]}, '
+    "avec une entrée par question."
+)
+
+# Menus des écrans de configuration, construits une seule fois à l'import
+LLM_TYPES = {
+    "1": {"name": "Ollama (Local)", "type": "ollama"},
+    "2": {"name": "LM Studio (Local)", "type": "lmstudio"},
+    "3": {"name": "OpenAI API", "type": "openai"},
+    "4": {"name": "OpenRouter API", "type": "openrouter"},
+    "5": {"name": "Anthropic API", "type": "anthropic"},
+    "6": {"name": "Groq API", "type": "groq"}
+}
+
+OPENAI_MODELS = {
+    "1": "gpt-4o-mini (Recommandé pour le code)",
+    "2": "gpt-4o (Plus puissant)",
+    "3": "gpt-3.5-turbo (Économique)",
+    "4": "Autre (saisie manuelle)"
+}
+
+OPENROUTER_FREE_MODELS = {
+    "1": "microsoft/phi-4-reasoning-plus:free (Gratuit - Nouveau ! Excellent pour le code)",
+    "2": "google/gemma-2-9b-it:free (Gratuit - Général)",
+    "3": "meta-llama/llama-3.1-8b-instruct:free (Gratuit - Général)"
+}
+
+OPENROUTER_PAID_MODELS = {
+    "4": "anthropic/claude-3.5-sonnet (Payant - Excellent pour le code)",
+    "5": "openai/gpt-4o (Payant - Très bon pour le code)",
+    "6": "google/gemini-pro-1.5 (Payant - Bon pour le code)",
+    "7": "meta-llama/llama-3.1-70b-instruct (Payant - Bon pour le code)",
+    "8": "Autre (saisie manuelle)"
+}
+
+OPENROUTER_MODELS = {**OPENROUTER_FREE_MODELS, **OPENROUTER_PAID_MODELS}
+
+# Identifiant OpenRouter de chaque option du menu
+OPENROUTER_MODEL_MAPPING = {
+    "1": "microsoft/phi-4-reasoning-plus:free",
+    "2": "microsoft/phi-3-mini-128k-instruct:free",
+    "3": "google/gemma-2-9b-it:free",
+    "4": "meta-llama/llama-3.1-8b-instruct:free",
+    "5": "anthropic/claude-3.5-sonnet",
+    "6": "openai/gpt-4o",
+    "7": "google/gemini-pro-1.5",
+    "8": "meta-llama/llama-3.1-70b-instruct"
+}
+
+ANTHROPIC_MODELS = {
+    "1": "claude-3-5-sonnet-20241022 (Recommandé pour le code)",
+    "2": "claude-3-haiku-20240307 (Plus rapide)",
+    "3": "Autre (saisie manuelle)"
+}
+
+GROQ_MODELS = {
+    "1": "llama-3.1-70b-versatile (Gratuit - Excellent pour le code)",
+    "2": "llama-3.1-8b-instant (Gratuit - Rapide)",
+    "3": "mixtral-8x7b-32768 (Gratuit - Bon pour le code)",
+    "4": "Autre (saisie manuelle)"
+}
+
+# Choix proposés pour chaque menu
+LLM_TYPE_CHOICES = list(LLM_TYPES)
+OPENAI_MODEL_CHOICES = list(OPENAI_MODELS)
+OPENROUTER_MODEL_CHOICES = list(OPENROUTER_MODELS)
+ANTHROPIC_MODEL_CHOICES = list(ANTHROPIC_MODELS)
+GROQ_MODEL_CHOICES = list(GROQ_MODELS)
+
+# Écran de configuration de chaque fournisseur d'API : tableaux (titre, menu, style),
+# choix possibles, modèle associé à chaque option (les autres options demandent
+# de saisir le nom du modèle) et URL de base de l'API. "idempotency" marque les
+# fournisseurs qui acceptent l'en-tête Idempotency-Key : seuls leurs POST sont réessayés.
+API_PROVIDERS = {
+    "openai": {
+        "label": "OpenAI",
+        "tables": [("Modèles OpenAI", OPENAI_MODELS, "default")],
+        "choices": OPENAI_MODEL_CHOICES,
+        "models": {"1": "gpt-4o-mini", "2": "gpt-4o", "3": "gpt-3.5-turbo"},
+        "api_url": "https://api.openai.com/v1",
+        "idempotency": True
+    },
+    "openrouter": {
+        "label": "OpenRouter",
+        "tables": [
+            ("Modèles OpenRouter GRATUITS", OPENROUTER_FREE_MODELS, "default"),
+            ("Modèles OpenRouter PAYANTS (Performance supérieure)", OPENROUTER_PAID_MODELS, "dim")
+        ],
+        "choices": OPENROUTER_MODEL_CHOICES,
+        "models": OPENROUTER_MODEL_MAPPING,
+        "api_url": "https://openrouter.ai/api/v1"
+    },
+    "anthropic": {
+        "label": "Anthropic",
+        "tables": [("Modèles Anthropic", ANTHROPIC_MODELS, "default")],
+        "choices": ANTHROPIC_MODEL_CHOICES,
+        "models": {"1": "claude-3-5-sonnet-20241022", "2": "claude-3-haiku-20240307"},
+        "api_url": "https://api.anthropic.com"
+    },
+    "groq": {
+        "label": "Groq",
+        "tables": [("Modèles Groq (API gratuite avec limites)", GROQ_MODELS, "default")],
+        "choices": GROQ_MODEL_CHOICES,
+        "models": {"1": "llama-3.1-70b-versatile", "2": "llama-3.1-8b-instant", "3": "mixtral-8x7b-32768"},
+        "api_url": "https://api.groq.com/openai/v1"
+    }
+}
+
+# Configuration analysée par chemin, sous la forme (mtime_ns, config)
+_CONFIG_CACHE: Dict[Path, tuple] = {}
+
+def raise_for_status(response: "requests.Response"):
+    """Lève HTTPError en cas d'erreur, après avoir lu le corps pour pouvoir l'afficher"""
+    if not response.ok:
+        # La connexion est rendue à la fermeture du flux, le corps doit être lu avant
+        response.content
+    response.raise_for_status()
+
+def iter_sse_events(response: "requests.Response") -> Iterator[Dict[str, Any]]:
+    """Renvoie le contenu JSON de chaque événement SSE d'une réponse en streaming"""
+    for line in response.iter_lines():
+        # Ignorer les lignes vides de keep-alive, les commentaires et les lignes "event:"
+        if not line.startswith(b"data:"):
+            continue
+        payload = line[5:].strip()
+        if payload == b"[DONE]":
+            break
+        yield json_loads(payload)
+
+def iter_chat_deltas(response: "requests.Response") -> Iterator[str]:
+    """Renvoie les fragments de texte d'une complétion de chat OpenAI en streaming"""
+    for chunk in iter_sse_events(response):
+        choices = chunk.get("choices")
+        if choices:
+            content = choices[0].get("delta", {}).get("content")
+            if content:
+                yield content
+
+# Attente maximale entre deux essais, même si le serveur demande plus via Retry-After
+RETRY_AFTER_MAX_S = 10
+
+def create_retry(retry_posts: bool = False) -> "Retry":
+    """Politique de nouvel essai sur 429/5xx, POST compris si retry_posts est vrai
+    
+    Après le dernier essai la réponse est rendue telle quelle pour que
+    raise_for_status produise le message d'erreur habituel. Un délai de lecture
+    dépassé n'est jamais rejoué : le LLM traite peut-être déjà la requête.
+    """
+    from urllib3.util.retry import Retry
+    
+    class CappedRetry(Retry):
+        def get_retry_after(self, response):
+            retry_after = super().get_retry_after(response)
+            return None if retry_after is None else min(retry_after, RETRY_AFTER_MAX_S)
+    
+    allowed_methods = Retry.DEFAULT_ALLOWED_METHODS
+    if retry_posts:
+        allowed_methods = allowed_methods | {"POST"}
+    return CappedRetry(
+        total=3,
+        read=False,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=allowed_methods,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+
+def create_http_session() -> "requests.Session":
+    """Crée une session HTTP qui garde les connexions au LLM ouvertes entre les messages"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    
+    session = requests.Session()
+    # Les POST ne sont réessayés que pour les fournisseurs qui gèrent l'idempotence,
+    # voir AITerminalChat.mount_provider_retries
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=create_retry())
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # En-tête commun à tous les fournisseurs : les corps sont envoyés déjà encodés en JSON
+    session.headers["Content-Type"] = "application/json"
+    return session
+
 class AITerminalChat:
     def __init__(self, secure_mode: bool = False):
+        load_rich()
         self.console = Console()
+        self.session = create_http_session()
+        self.history: List[Dict[str, Any]] = []
+        self.generation_overrides: Dict[str, Any] = {}
         self.config_dir = Path.home() / ".ai_terminal_chat"
         self.config_file = self.config_dir / "config.json"
         self.secure_mode = secure_mode
@@ -69,6 +296,35 @@ class AITerminalChat:
             self.secure_config_manager = None
         
         self.config = self.load_config()
+        self.select_sender()
+        self.mount_provider_retries()
+        self.update_generation_settings()
+    
+    def select_sender(self):
+        """Choisit une fois pour toutes la méthode d'envoi adaptée au LLM configuré"""
+        senders = {
+            "ollama": self.send_to_local_llm,
+            "lmstudio": self.send_to_local_llm,
+            "openai": self.send_to_api_llm,
+            "openrouter": self.send_to_api_llm,
+            "anthropic": self.send_to_api_llm,
+            "groq": self.send_to_api_llm
+        }
+        self.sender = senders.get(self.config.get("llm_type"), self.send_to_api_llm)
+        
+    def mount_provider_retries(self):
+        """Réessaie aussi les POST vers le fournisseur configuré s'il gère Idempotency-Key"""
+        provider = API_PROVIDERS.get(self.config.get("llm_type"), {})
+        if provider.get("idempotency") and self.config.get("api_url"):
+            from requests.adapters import HTTPAdapter
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=create_retry(retry_posts=True))
+            self.session.mount(self.config["api_url"], adapter)
+    
+    def update_generation_settings(self):
+        """Calcule une fois pour toutes les réglages de génération envoyés avec chaque message"""
+        # Réglages demandés explicitement, par la configuration ou la ligne de commande
+        self.requested_generation = {**self.config.get("generation", {}), **self.generation_overrides}
+        self.generation = {**DEFAULT_GENERATION, **self.requested_generation}
         
     def validate_user_input(self, user_input: str) -> bool:
         """Validate user input for security"""
@@ -87,16 +343,25 @@ class AITerminalChat:
         if not self.config_dir.exists():
             self.config_dir.mkdir(parents=True)
             
-        if not self.config_file.exists():
+        try:
+            mtime = self.config_file.stat().st_mtime_ns
+        except FileNotFoundError:
             return self.setup_initial_config()
         
+        # Réutiliser la configuration analysée tant que le fichier n'a pas changé
+        cached = _CONFIG_CACHE.get(self.config_file)
+        if cached and cached[0] == mtime:
+            return dict(cached[1])
+        
         try:
-            with open(self.config_file, 'r') as f:
+            with open(self.config_file, 'rb') as f:
                 content = f.read().strip()
                 if not content:  # Fichier vide
                     self.console.print("[dim]Fichier de configuration vide, création d'une nouvelle configuration...[/dim]")
                     return self.setup_initial_config()
-                return json.loads(content)
+                config = json_loads(content)
+            _CONFIG_CACHE[self.config_file] = (mtime, config)
+            return dict(config)
         except (json.JSONDecodeError, FileNotFoundError) as e:
             self.console.print(f"[bold]Fichier de configuration corrompu ({e}), création d'une nouvelle configuration...[/bold]")
             # Sauvegarder l'ancien fichier corrompu
@@ -112,8 +377,15 @@ class AITerminalChat:
     def save_config(self):
         """Sauvegarde la configuration"""
         try:
-            with open(self.config_file, 'w') as f:
-                json.dump(self.config, f, indent=2)
+            # Écrire dans un fichier temporaire puis le renommer, pour ne jamais laisser un fichier à moitié écrit
+            # Le fichier contient les clés API : créé en 0600, comme le fichier qu'il remplace
+            tmp_file = self.config_file.with_suffix('.json.tmp')
+            fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            os.chmod(tmp_file, 0o600)  # au cas où un ancien .tmp traînait avec d'autres droits
+            with os.fdopen(fd, 'wb') as f:
+                f.write(json_dumps(self.config, indent=True))
+            os.replace(tmp_file, self.config_file)
+            _CONFIG_CACHE[self.config_file] = (self.config_file.stat().st_mtime_ns, dict(self.config))
         except Exception as e:
             self.console.print(f"[bold]Erreur lors de la sauvegarde de la configuration: {e}[/bold]")
     
@@ -121,35 +393,25 @@ class AITerminalChat:
         """Configuration initiale interactive"""
         self.console.print(Panel.fit("🤖 Configuration initiale de AI Terminal Chat", style="bold"))
         
-        # Types de LLM disponibles
-        llm_types = {
-            "1": {"name": "Ollama (Local)", "type": "ollama"},
-            "2": {"name": "LM Studio (Local)", "type": "lmstudio"},
-            "3": {"name": "OpenAI API", "type": "openai"},
-            "4": {"name": "OpenRouter API", "type": "openrouter"},
-            "5": {"name": "Anthropic API", "type": "anthropic"},
-            "6": {"name": "Groq API", "type": "groq"}
-        }
-        
         # Affichage des options
         table = Table(title="Types de LLM disponibles")
         table.add_column("Option", style="bold")
         table.add_column("Description", style="default")
         table.add_column("Type", style="dim")
         
-        for key, value in llm_types.items():
+        for key, value in LLM_TYPES.items():
             table.add_row(key, value["name"], value["type"])
         
         self.console.print(table)
         
         try:
-            choice = safe_prompt("Choisissez votre type de LLM", choices=list(llm_types.keys()))
+            choice = safe_prompt("Choisissez votre type de LLM", choices=LLM_TYPE_CHOICES)
         except KeyboardInterrupt:
             print("\n\n⚠️  Configuration annulée par l'utilisateur.")
             print("💡 Vous pouvez relancer la configuration plus tard avec: chat --config")
             sys.exit(0)
         
-        selected_llm = llm_types[choice]
+        selected_llm = LLM_TYPES[choice]
         
         config = {
             "llm_type": selected_llm["type"],
@@ -161,17 +423,14 @@ class AITerminalChat:
             config.update(self.setup_ollama())
         elif selected_llm["type"] == "lmstudio":
             config.update(self.setup_lmstudio())
-        elif selected_llm["type"] == "openai":
-            config.update(self.setup_openai())
-        elif selected_llm["type"] == "openrouter":
-            config.update(self.setup_openrouter())
-        elif selected_llm["type"] == "anthropic":
-            config.update(self.setup_anthropic())
-        elif selected_llm["type"] == "groq":
-            config.update(self.setup_groq())
+        elif selected_llm["type"] in API_PROVIDERS:
+            config.update(self.setup_api_provider(selected_llm["type"]))
         
         # Assigner la config avant de sauvegarder
         self.config = config
+        self.select_sender()
+        self.mount_provider_retries()
+        self.update_generation_settings()
         
         # Sauvegarder la config
         self.save_config()
@@ -181,21 +440,19 @@ class AITerminalChat:
         """Configuration Ollama"""
         self.console.print("[bold]Configuration Ollama[/bold]")
         
+        installed, listing = get_ollama_models()
+        
         # Vérifier si Ollama est installé
-        if not shutil.which("ollama"):
+        if not installed:
             self.console.print("[bold]Ollama n'est pas installé. Installez-le depuis https://ollama.ai[/bold]")
             sys.exit(1)
         
         # Lister les modèles disponibles
-        try:
-            result = subprocess.run(["ollama", "list"], capture_output=True, text=True)
-            if result.returncode == 0:
-                self.console.print("[bold]Modèles Ollama disponibles:[/bold]")
-                self.console.print(result.stdout)
-            else:
-                self.console.print("[dim]Aucun modèle Ollama trouvé.[/dim]")
-        except Exception:
-            pass
+        if listing:
+            self.console.print("[bold]Modèles Ollama disponibles:[/bold]")
+            self.console.print(listing)
+        elif listing is not None:
+            self.console.print("[dim]Aucun modèle Ollama trouvé.[/dim]")
         
         model = safe_prompt("Modèle Ollama à utiliser", default="llama2")
         base_url = safe_prompt("URL de base Ollama", default="http://localhost:11434")
@@ -217,212 +474,103 @@ class AITerminalChat:
             "api_url": base_url
         }
     
-    def setup_openai(self) -> Dict[str, Any]:
-        """Configuration OpenAI"""
-        self.console.print("[bold]Configuration OpenAI[/bold]")
-        
-        # Modèles recommandés
-        models = {
-            "1": "gpt-4o-mini (Recommandé pour le code)",
-            "2": "gpt-4o (Plus puissant)",
-            "3": "gpt-3.5-turbo (Économique)",
-            "4": "Autre (saisie manuelle)"
-        }
-        
-        table = Table(title="Modèles OpenAI")
-        table.add_column("Option", style="bold")
-        table.add_column("Modèle", style="default")
-        
-        for key, value in models.items():
-            table.add_row(key, value)
+    def setup_api_provider(self, llm_type: str) -> Dict[str, Any]:
+        """Configuration d'un fournisseur d'API (OpenAI, OpenRouter, Anthropic, Groq)"""
+        provider = API_PROVIDERS[llm_type]
+        self.console.print(f"[bold]Configuration {provider['label']}[/bold]")
         
-        self.console.print(table)
+        for title, models, style in provider["tables"]:
+            self.console.print(make_models_table(title, models, style=style))
         
-        choice = safe_prompt("Choisissez un modèle", choices=list(models.keys()))
+        choice = safe_prompt("Choisissez un modèle", choices=provider["choices"])
+        model = provider["models"].get(choice) or safe_prompt("Nom du modèle")
         
-        if choice == "1":
-            model = "gpt-4o-mini"
-        elif choice == "2":
-            model = "gpt-4o"
-        elif choice == "3":
-            model = "gpt-3.5-turbo"
-        else:
-            model = safe_prompt("Nom du modèle")
+        return {
+            "model": model,
+            "api_key": self.prompt_api_key(llm_type),
+            "api_url": provider["api_url"]
+        }
+    
+    def prompt_api_key(self, llm_type: str) -> str:
+        """Demande la clé API, avec validation de son format en mode sécurisé"""
+        label = API_PROVIDERS[llm_type]["label"]
         
         # Secure API key input with validation
         if self.secure_mode and self.security_manager:
-            api_key = secure_password_prompt("Clé API OpenAI")
-            
-            # Validate API key format
-            if not self.security_manager.validate_api_key_format(api_key, "openai"):
+            while True:
+                api_key = secure_password_prompt(f"Clé API {label}")
+                
+                # Validate API key format
+                if self.security_manager.validate_api_key_format(api_key, llm_type):
+                    break
                 self.console.print("⚠️  Format de clé API non valide détecté", style="yellow")
                 confirm = safe_prompt("Continuer quand même? (y/N)", default="n")
-                if confirm.lower() != 'y':
-                    return self.setup_openai()  # Retry
+                if confirm.lower() == 'y':
+                    break
             
             # Display masked key for confirmation
             masked_key = self.security_manager.mask_api_key(api_key)
             self.console.print(f"Clé API masquée: {masked_key}")
-        else:
-            api_key = safe_prompt("Clé API OpenAI", password=True)
+            return api_key
         
-        return {
-            "model": model,
-            "api_key": api_key,
-            "api_url": "https://api.openai.com/v1"
-        }
+        return safe_prompt(f"Clé API {label}", password=True)
     
-    def setup_openrouter(self) -> Dict[str, Any]:
-        """Configuration OpenRouter"""
-        self.console.print("[bold]Configuration OpenRouter[/bold]")
-        
-        # Modèles gratuits et payants
-        free_models = {
-            "1": "microsoft/phi-4-reasoning-plus:free (Gratuit - Nouveau ! Excellent pour le code)",
-            "2": "google/gemma-2-9b-it:free (Gratuit - Général)",
-            "3": "meta-llama/llama-3.1-8b-instruct:free (Gratuit - Général)"
-        }
-        
-        paid_models = {
-            "4": "anthropic/claude-3.5-sonnet (Payant - Excellent pour le code)",
-            "5": "openai/gpt-4o (Payant - Très bon pour le code)",
-            "6": "google/gemini-pro-1.5 (Payant - Bon pour le code)",
-            "7": "meta-llama/llama-3.1-70b-instruct (Payant - Bon pour le code)",
-            "8": "Autre (saisie manuelle)"
-        }
-        
-        # Affichage des modèles gratuits
-        table_free = Table(title="Modèles OpenRouter GRATUITS")
-        table_free.add_column("Option", style="bold")
-        table_free.add_column("Modèle", style="default")
-        
-        for key, value in free_models.items():
-            table_free.add_row(key, value)
-        
-        self.console.print(table_free)
-        
-        # Affichage des modèles payants
-        table_paid = Table(title="Modèles OpenRouter PAYANTS (Performance supérieure)")
-        table_paid.add_column("Option", style="bold")
-        table_paid.add_column("Modèle", style="dim")
-        
-        for key, value in paid_models.items():
-            table_paid.add_row(key, value)
-        
-        self.console.print(table_paid)
-        
-        all_models = {**free_models, **paid_models}
-        choice = safe_prompt("Choisissez un modèle", choices=list(all_models.keys()))
-        
-        model_mapping = {
-            "1": "microsoft/phi-4-reasoning-plus:free",
-            "2": "microsoft/phi-3-mini-128k-instruct:free",
-            "3": "google/gemma-2-9b-it:free", 
-            "4": "meta-llama/llama-3.1-8b-instruct:free",
-            "5": "anthropic/claude-3.5-sonnet",
-            "6": "openai/gpt-4o",
-            "7": "google/gemini-pro-1.5",
-            "8": "meta-llama/llama-3.1-70b-instruct"
-        }
-        
-        if choice in model_mapping:
-            model = model_mapping[choice]
-        else:
-            model = safe_prompt("Nom du modèle")
-        
-        api_key = safe_prompt("Clé API OpenRouter", password=True)
-        
-        return {
-            "model": model,
-            "api_key": api_key,
-            "api_url": "https://openrouter.ai/api/v1"
-        }
+    def send_message(self, message: str, remember: bool = True, json_mode: bool = False) -> str:
+        """Envoie un message au LLM configuré et renvoie la réponse complète"""
+        return "".join(self.stream_message(message, remember, json_mode))
     
-    def setup_anthropic(self) -> Dict[str, Any]:
-        """Configuration Anthropic"""
-        self.console.print("[bold]Configuration Anthropic[/bold]")
-        
-        models = {
-            "1": "claude-3-5-sonnet-20241022 (Recommandé pour le code)",
-            "2": "claude-3-haiku-20240307 (Plus rapide)",
-            "3": "Autre (saisie manuelle)"
-        }
-        
-        table = Table(title="Modèles Anthropic")
-        table.add_column("Option", style="bold")
-        table.add_column("Modèle", style="default")
-        
-        for key, value in models.items():
-            table.add_row(key, value)
-        
-        self.console.print(table)
-        
-        choice = safe_prompt("Choisissez un modèle", choices=list(models.keys()))
-        
-        if choice == "1":
-            model = "claude-3-5-sonnet-20241022"
-        elif choice == "2":
-            model = "claude-3-haiku-20240307"
-        else:
-            model = safe_prompt("Nom du modèle")
-        
-        api_key = safe_prompt("Clé API Anthropic", password=True)
-        
-        return {
-            "model": model,
-            "api_key": api_key,
-            "api_url": "https://api.anthropic.com"
-        }
+    def send_many(self, messages: List[str], max_workers: int = 4) -> List[str]:
+        """Envoie plusieurs messages indépendants en parallèle et renvoie les réponses dans l'ordre
+        
+        Les requêtes se chevauchent sur la session partagée : la durée totale est
+        proche de celle de la réponse la plus lente plutôt que de leur somme. Les
+        messages sont envoyés sans l'historique de conversation et n'y sont pas ajoutés.
+        """
+        if not messages:
+            return []
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(messages))) as executor:
+            return list(executor.map(lambda message: self.send_message(message, remember=False), messages))
     
-    def setup_groq(self) -> Dict[str, Any]:
-        """Configuration Groq"""
-        self.console.print("[bold]Configuration Groq[/bold]")
-        
-        models = {
-            "1": "llama-3.1-70b-versatile (Gratuit - Excellent pour le code)",
-            "2": "llama-3.1-8b-instant (Gratuit - Rapide)",
-            "3": "mixtral-8x7b-32768 (Gratuit - Bon pour le code)",
-            "4": "Autre (saisie manuelle)"
-        }
-        
-        table = Table(title="Modèles Groq (API gratuite avec limites)")
-        table.add_column("Option", style="bold")
-        table.add_column("Modèle", style="default")
-        
-        for key, value in models.items():
-            table.add_row(key, value)
-        
-        self.console.print(table)
-        
-        choice = safe_prompt("Choisissez un modèle", choices=list(models.keys()))
-        
-        if choice == "1":
-            model = "llama-3.1-70b-versatile"
-        elif choice == "2":
-            model = "llama-3.1-8b-instant"
-        elif choice == "3":
-            model = "mixtral-8x7b-32768"
-        else:
-            model = safe_prompt("Nom du modèle")
-        
-        api_key = safe_prompt("Clé API Groq", password=True)
-        
-        return {
-            "model": model,
-            "api_key": api_key,
-            "api_url": "https://api.groq.com/openai/v1"
-        }
+    def send_marshalled(self, prompts: List[str], batch_size: int = 4) -> List[str]:
+        """Envoie les questions par groupes de batch_size dans une seule requête et renvoie les réponses dans l'ordre
+        
+        Utile quand le fournisseur limite le nombre de requêtes par minute : une
+        requête porte plusieurs questions courtes et la réponse JSON est répartie
+        entre elles. Les questions dont la réponse manque sont renvoyées une par une.
+        """
+        answers = []
+        for start in range(0, len(prompts), max(batch_size, 1)):
+            group = prompts[start:start + max(batch_size, 1)]
+            numbered = "\n".join(f"{i}. {prompt}" for i, prompt in enumerate(group, 1))
+            reply = self.send_message(f"{MARSHAL_INSTRUCTIONS}\n\n{numbered}", remember=False, json_mode=True)
+            texts = parse_marshalled_answers(reply)
+            
+            missing = [i for i in range(1, len(group) + 1) if i not in texts]
+            for i, text in zip(missing, self.send_many([group[i - 1] for i in missing])):
+                texts[i] = text
+            answers.extend(texts[i] for i in range(1, len(group) + 1))
+        return answers
     
-    def send_message(self, message: str) -> str:
-        """Envoie un message au LLM configuré avec vérifications de sécurité"""
+    def stream_message(self, message: str, remember: bool = True, json_mode: bool = False) -> Iterator[str]:
+        """Envoie un message au LLM configuré avec vérifications de sécurité, en renvoyant la réponse au fil de l'eau
+        
+        Avec remember=True, l'historique est envoyé avec le message et l'échange y
+        est ajouté une fois la réponse reçue en entier. Avec json_mode=True, le
+        fournisseur est prié de répondre par un objet JSON quand il le permet.
+        """
         
         # Validate user input for security
         if not self.validate_user_input(message):
-            return "❌ Message refusé pour des raisons de sécurité. Évitez les caractères spéciaux et commandes système."
+            yield "❌ Message refusé pour des raisons de sécurité. Évitez les caractères spéciaux et commandes système."
+            return
         
         # Check rate limits
         if not self.check_rate_limit():
-            return "⚠️  Limite de taux atteinte. Veuillez attendre avant de faire une nouvelle requête."
+            yield "⚠️  Limite de taux atteinte. Veuillez attendre avant de faire une nouvelle requête."
+            return
+        
+        import requests
         
         # Log security event
         if self.security_manager:
@@ -432,11 +580,16 @@ class AITerminalChat:
                 "message_length": len(message)
             })
         
+        user_message = {"role": "user", "content": message}
+        messages = self.history + [user_message] if remember else [user_message]
+        if self.config.get("system_prompt"):
+            messages.insert(0, {"role": "system", "content": self.config["system_prompt"]})
+        
+        parts = []
         try:
-            if self.config["llm_type"] in ["ollama", "lmstudio"]:
-                return self.send_to_local_llm(message)
-            else:
-                return self.send_to_api_llm(message)
+            for chunk in self.sender(messages, json_mode):
+                parts.append(chunk)
+                yield chunk
         except requests.exceptions.HTTPError as e:
             # Log error for security monitoring
             if self.security_manager:
@@ -447,19 +600,19 @@ class AITerminalChat:
             
             # Erreur HTTP spécifique
             if e.response.status_code == 404:
-                return f"❌ Erreur 404: Endpoint API non trouvé. Vérifiez la configuration de votre LLM.\nURL utilisée: {e.response.url}\nType LLM: {self.config['llm_type']}"
+                yield f"❌ Erreur 404: Endpoint API non trouvé. Vérifiez la configuration de votre LLM.\nURL utilisée: {e.response.url}\nType LLM: {self.config['llm_type']}"
             elif e.response.status_code == 401:
-                return f"❌ Erreur 401: Clé API invalide ou expirée pour {self.config['llm_type']}"
+                yield f"❌ Erreur 401: Clé API invalide ou expirée pour {self.config['llm_type']}"
             elif e.response.status_code == 429:
-                return f"❌ Erreur 429: Limite de taux dépassée pour {self.config['llm_type']}. Attendez un moment."
+                yield f"❌ Erreur 429: Limite de taux dépassée pour {self.config['llm_type']}. Attendez un moment."
             else:
-                return f"❌ Erreur HTTP {e.response.status_code}: {e.response.text}"
+                yield f"❌ Erreur HTTP {e.response.status_code}: {e.response.text}"
         except requests.exceptions.ConnectionError:
-            return f"❌ Erreur de connexion. Vérifiez votre connexion internet et l'URL de base: {self.config.get('api_url', 'non configurée')}"
+            yield f"❌ Erreur de connexion. Vérifiez votre connexion internet et l'URL de base: {self.config.get('api_url', 'non configurée')}"
         except requests.exceptions.Timeout:
-            return f"❌ Timeout: Le LLM {self.config['llm_type']} met trop de temps à répondre"
+            yield f"❌ Timeout: Le LLM {self.config['llm_type']} met trop de temps à répondre"
         except KeyError as e:
-            return f"❌ Erreur de configuration: clé manquante {e}. Utilisez 'config' pour reconfigurer."
+            yield f"❌ Erreur de configuration: clé manquante {e}. Utilisez 'config' pour reconfigurer."
         except Exception as e:
             # Log unexpected errors
             if self.security_manager:
@@ -467,31 +620,59 @@ class AITerminalChat:
                     "error": str(e),
                     "llm_type": self.config.get("llm_type", "unknown")
                 })
-            return f"❌ Erreur lors de l'envoi du message: {str(e)}"
+            yield f"❌ Erreur lors de l'envoi du message: {str(e)}"
+        else:
+            # Seuls les échanges aboutis sont conservés dans l'historique
+            if remember:
+                self.remember_exchange(user_message, "".join(parts))
     
-    def send_to_local_llm(self, message: str) -> str:
+    def remember_exchange(self, user_message: Dict[str, Any], response: str):
+        """Ajoute un échange à l'historique en le limitant à MAX_HISTORY_CHARS caractères"""
+        self.history.append(user_message)
+        self.history.append({"role": "assistant", "content": response})
+        # Oublier les échanges les plus anciens, en gardant toujours le dernier
+        size = sum(len(m["content"]) for m in self.history)
+        while size > MAX_HISTORY_CHARS and len(self.history) > 2:
+            size -= len(self.history.pop(0)["content"]) + len(self.history.pop(0)["content"])
+    
+    def send_to_local_llm(self, messages: List[Dict[str, Any]], json_mode: bool = False) -> Iterator[str]:
         """Envoi vers un LLM local (Ollama/LMStudio)"""
-        url = f"{self.config['api_url']}/api/generate"
-        
         data = {
             "model": self.config["model"],
-            "prompt": message,
-            "stream": False
+            "messages": messages,
+            "stream": True
         }
         
-        response = requests.post(url, json=data, timeout=120)
-        response.raise_for_status()
+        # Les serveurs locaux gardent leurs propres valeurs par défaut pour ce qui n'est pas demandé
+        requested = {key: value for key, value in self.requested_generation.items() if key in OLLAMA_OPTION_NAMES}
+        timeout = self.generation["timeout_s"]
         
         if self.config["llm_type"] == "ollama":
-            return response.json()["response"]
-        else:  # LMStudio
-            return response.json()["choices"][0]["text"]
+            if json_mode:
+                data["format"] = "json"
+            if requested:
+                data["options"] = {OLLAMA_OPTION_NAMES[key]: value for key, value in requested.items()}
+            with self.session.post(f"{self.config['api_url']}/api/chat", data=json_dumps(data), timeout=timeout, stream=True) as response:
+                raise_for_status(response)
+                # Ollama envoie un objet JSON par ligne
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json_loads(line)
+                    content = chunk.get("message", {}).get("content")
+                    if content:
+                        yield content
+                    if chunk.get("done"):
+                        break
+        else:  # LMStudio (API compatible OpenAI)
+            data.update(requested)
+            with self.session.post(f"{self.config['api_url']}/v1/chat/completions", data=json_dumps(data), timeout=timeout, stream=True) as response:
+                raise_for_status(response)
+                yield from iter_chat_deltas(response)
     
-    def send_to_api_llm(self, message: str) -> str:
+    def send_to_api_llm(self, messages: List[Dict[str, Any]], json_mode: bool = False) -> Iterator[str]:
         """Envoi vers une API externe"""
-        headers = {
-            "Content-Type": "application/json"
-        }
+        headers = {}
         
         if self.config["llm_type"] == "anthropic":
             headers["x-api-key"] = self.config["api_key"]
@@ -499,21 +680,41 @@ class AITerminalChat:
             
             data = {
                 "model": self.config["model"],
-                "max_tokens": 4096,
-                "messages": [{"role": "user", "content": message}]
+                "max_tokens": self.generation["max_tokens"],
+                "messages": [m for m in messages if m["role"] != "system"],
+                "stream": True
             }
+            # Anthropic garde sa température par défaut si elle n'est pas demandée
+            for key in ("temperature", "top_p"):
+                if key in self.requested_generation:
+                    data[key] = self.requested_generation[key]
+            # Anthropic attend le prompt système à part
+            if messages[0]["role"] == "system":
+                data["system"] = messages[0]["content"]
             
-            response = requests.post(
+            with self.session.post(
                 f"{self.config['api_url']}/v1/messages",
                 headers=headers,
-                json=data,
-                timeout=120
-            )
-            response.raise_for_status()
-            return response.json()["content"][0]["text"]
+                data=json_dumps(data),
+                timeout=self.generation["timeout_s"],
+                stream=True
+            ) as response:
+                raise_for_status(response)
+                for event in iter_sse_events(response):
+                    if event.get("type") == "content_block_delta":
+                        text = event.get("delta", {}).get("text")
+                        if text:
+                            yield text
+                    elif event.get("type") == "message_stop":
+                        break
+                    elif event.get("type") == "error":
+                        raise RuntimeError(event.get("error", {}).get("message", "erreur de streaming"))
         
         else:  # OpenAI, OpenRouter, Groq (compatible OpenAI)
             headers["Authorization"] = f"Bearer {self.config['api_key']}"
+            # Même clé pour tous les essais, pour que le fournisseur puisse ignorer un doublon
+            if API_PROVIDERS.get(self.config["llm_type"], {}).get("idempotency"):
+                headers["Idempotency-Key"] = str(uuid.uuid4())
             
             # Ajouter des en-têtes spécifiques pour OpenRouter (SELON LA DOC OFFICIELLE)
             if self.config["llm_type"] == "openrouter":
@@ -522,31 +723,37 @@ class AITerminalChat:
             
             data = {
                 "model": self.config["model"],
-                "messages": [{"role": "user", "content": message}],
-                "max_tokens": 4096,
-                "temperature": 0.7
+                "messages": messages,
+                "max_tokens": self.generation["max_tokens"],
+                "temperature": self.generation["temperature"],
+                "top_p": self.generation["top_p"],
+                "stream": True
             }
+            if json_mode:
+                data["response_format"] = {"type": "json_object"}
             
-            # CORRECTION CLÉE : OpenRouter veut data=json.dumps(), pas json=data
-            if self.config["llm_type"] == "openrouter":
-                import json
-                response = requests.post(
-                    f"{self.config['api_url']}/chat/completions",
-                    headers=headers,
-                    data=json.dumps(data),  # <-- VOICI LA CORRECTION !
-                    timeout=120
-                )
-            else:
-                # Groq et OpenAI utilisent json=data normalement
-                response = requests.post(
-                    f"{self.config['api_url']}/chat/completions",
-                    headers=headers,
-                    json=data,
-                    timeout=120
-                )
-            
-            response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"]
+            with self.session.post(
+                f"{self.config['api_url']}/chat/completions",
+                headers=headers,
+                data=json_dumps(data),
+                timeout=self.generation["timeout_s"],
+                stream=True
+            ) as response:
+                raise_for_status(response)
+                yield from iter_chat_deltas(response)
+    
+    def preconnect(self):
+        """Établit la connexion (DNS, TCP, TLS) avec le LLM pour que le premier message n'en paie pas le coût"""
+        url = self.config.get("api_url")
+        if not url:
+            return
+        if self.config.get("llm_type") == "anthropic":
+            url = f"{url}/v1/messages"
+        try:
+            # HEAD n'a pas de corps : la connexion retourne aussitôt dans le pool de la session
+            self.session.head(url, timeout=3)
+        except Exception:
+            pass
     
     def format_response(self, response: str):
         """Formate la réponse avec Rich (markdown, code, etc.)"""
@@ -572,6 +779,9 @@ class AITerminalChat:
             style="bold"
         ))
         
+        # Ouvrir la connexion pendant que l'utilisateur tape sa première question
+        threading.Thread(target=self.preconnect, daemon=True).start()
+        
         last_response = ""
         
         try:
@@ -584,6 +794,7 @@ class AITerminalChat:
                 elif user_input.lower() == 'copy':
                     if last_response:
                         try:
+                            import pyperclip
                             pyperclip.copy(last_response)
                             self.console.print("[bold]✓ Réponse copiée dans le presse-papiers[/bold]")
                         except Exception:
@@ -595,22 +806,138 @@ class AITerminalChat:
                     self.config = self.setup_initial_config()
                     continue
                 
-                # Indicateur de chargement
-                with self.console.status("[bold]🤔 Réflexion en cours..."):
-                    response = self.send_message(user_input)
+                # Afficher la réponse au fil de l'eau, avec un indicateur jusqu'au premier fragment.
+                # Les blocs terminés sont imprimés une fois pour toutes au-dessus de la zone Live,
+                # qui ne réanalyse que le bloc en cours au lieu de toute la réponse.
+                parts = []
+                pending = ""
+                committed = False
+                last_render = 0.0
+                with Live(Spinner("dots", text="[bold]🤔 Réflexion en cours..."), console=self.console,
+                          refresh_per_second=20, transient=True) as live:
+                    for chunk in self.stream_message(user_input):
+                        parts.append(chunk)
+                        pending += chunk
+                        # Ne pas réanalyser le markdown à chaque fragment, seulement toutes les 50 ms
+                        now = time.monotonic()
+                        if now - last_render >= 0.05:
+                            done, pending = split_markdown_blocks(pending)
+                            if done:
+                                # La ligne vide séparant les blocs est perdue au découpage
+                                live.console.print(Markdown(done), "")
+                                committed = True
+                            live.update(Markdown(pending))
+                            last_render = now
+                response = "".join(parts)
                 
                 last_response = response
-                self.format_response(response)
+                if committed:
+                    # Le début est déjà affiché, il ne reste que le dernier bloc
+                    if pending.strip():
+                        self.console.print(Markdown(pending))
+                else:
+                    self.format_response(response)
                 
         except KeyboardInterrupt:
             self.console.print("\n[dim]Au revoir! 👋[/dim]")
         except Exception as e:
             self.console.print(f"[bold]Erreur: {e}[/bold]")
+        finally:
+            self.session.close()
+
+def make_models_table(title: str, models: Dict[str, str], style: str = "default") -> "Table":
+    """Construit le tableau d'un menu de modèles à partir de ses lignes précalculées"""
+    # Les tables rich sont modifiables, on en crée donc une nouvelle à chaque affichage
+    table = Table(title=title)
+    table.add_column("Option", style="bold")
+    table.add_column("Modèle", style=style)
+    for row in models.items():
+        table.add_row(*row)
+    return table
+
+@functools.lru_cache(maxsize=1)
+def get_ollama_models() -> tuple:
+    """Renvoie (installé, sortie de `ollama list`), une seule fois par processus
+    
+    La sortie vaut "" si la commande a échoué et None si elle n'a pas pu être lancée.
+    """
+    if not shutil.which("ollama"):
+        return False, None
+    
+    import subprocess
+    try:
+        # Le délai évite qu'un démon bloqué fige la configuration
+        result = subprocess.run(["ollama", "list"], capture_output=True, text=True, timeout=2)
+    except Exception:
+        return True, None
+    return True, result.stdout if result.returncode == 0 else ""
+
+def split_markdown_blocks(text: str) -> tuple:
+    """Sépare le texte en (blocs terminés, bloc en cours) sur la dernière ligne vide hors bloc de code"""
+    pos = text.rfind("\n\n")
+    # Une ligne vide dans un bloc de code ouvert ne termine pas le bloc
+    while pos != -1 and text.count("```", 0, pos) % 2:
+        pos = text.rfind("\n\n", 0, pos)
+    if pos == -1:
+        return "", text
+    return text[:pos], text[pos + 2:]
+
+def parse_marshalled_answers(reply: str) -> Dict[int, str]:
+    """Extrait les réponses {"answers": [{"id": ..., "text": ...}]} d'une réponse groupée, par numéro de question"""
+    # Certains modèles entourent le JSON de texte ou d'un bloc de code
+    start, end = reply.find("{"), reply.rfind("}")
+    try:
+        payload = json_loads(reply[start:end + 1])
+    except ValueError:
+        return {}
+    
+    answers = payload.get("answers") if isinstance(payload, dict) else None
+    if not isinstance(answers, list):
+        return {}
+    
+    texts = {}
+    for answer in answers:
+        if isinstance(answer, dict) and isinstance(answer.get("id"), int) and isinstance(answer.get("text"), str):
+            texts[answer["id"]] = answer["text"]
+    return texts
+
+def run_batch(chat: AITerminalChat, path: str, workers: int, marshal: int = 0):
+    """Envoie en parallèle les questions d'un fichier (une par ligne) et affiche les réponses"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            prompts = [line.strip() for line in f if line.strip()]
+    except OSError as e:
+        print(f"❌ Impossible de lire {path}: {e}")
+        sys.exit(1)
+    
+    if marshal:
+        responses = chat.send_marshalled(prompts, batch_size=marshal)
+    else:
+        responses = chat.send_many(prompts, max_workers=workers)
+    
+    for prompt, response in zip(prompts, responses):
+        chat.console.print(f"\n[bold]Vous:[/bold] {prompt}")
+        chat.format_response(response)
+
+def positive_int(value: str) -> int:
+    """Type argparse pour les options qui attendent un entier d'au moins 1"""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"doit être un entier positif, reçu {value!r}")
+    return number
 
 def main():
     parser = argparse.ArgumentParser(description="AI Terminal Chat - Assistant IA dans votre terminal (Secure Edition)")
     parser.add_argument("--config", action="store_true", help="Reconfigurer le LLM")
     parser.add_argument("--secure-mode", action="store_true", help="Activer le mode sécurisé")
+    parser.add_argument("--batch", metavar="FICHIER", help="Envoyer chaque ligne du fichier comme une question indépendante")
+    parser.add_argument("--workers", type=positive_int, default=4, help="Nombre de requêtes simultanées avec --batch (défaut: 4)")
+    parser.add_argument("--marshal", type=int, nargs="?", const=4, default=0, metavar="N",
+                        help="Avec --batch, regrouper les questions par N dans une seule requête (défaut: 4)")
+    parser.add_argument("--max-tokens", type=int, metavar="N", help="Nombre maximal de tokens par réponse pour cette session")
     parser.add_argument("--version", action="version", version="AI Terminal Chat 2.0 (Secure Edition)")
     args = parser.parse_args()
     
@@ -632,6 +959,14 @@ def main():
         if args.config:
             chat.config = chat.setup_initial_config()
         
+        if args.max_tokens:
+            chat.generation_overrides["max_tokens"] = args.max_tokens
+            chat.update_generation_settings()
+        
+        if args.batch:
+            run_batch(chat, args.batch, args.workers, args.marshal)
+            return
+        
         chat.start_chat()
         
     except KeyboardInterrupt:
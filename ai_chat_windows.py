@@ -6,12 +6,24 @@ Multilingual AI terminal chat application for Windows with PowerShell support
 
 import sys
 import os
+import functools
 import locale
-import subprocess
 import argparse
 import json
 import platform
 from pathlib import Path
+from typing import Any
+
+# Use orjson for (de)serialization when it is installed
+try:
+    import orjson
+    json_loads = orjson.loads
+    def json_dumps(obj: Any, indent: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+except ImportError:
+    json_loads = json.loads
+    def json_dumps(obj: Any, indent: bool = False) -> bytes:
+        return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False).encode('utf-8')
 
 # Import Windows helper if available
 try:
@@ -32,33 +44,32 @@ def get_config_dir():
         else:
             return Path.home() / ".ai_terminal_chat"
 
+# Primary language IDs (low 10 bits of a Windows LANGID) of the supported languages
+WINDOWS_LANGUAGE_IDS = {0x0C: 'fr', 0x09: 'en'}
+
 def get_system_language():
     """Detect system language on Windows"""
     try:
         if platform.system() == "Windows":
-            # Try Windows locale detection
+            # Ask Windows for the UI language directly: a single API call,
+            # instead of spawning PowerShell to read the culture
+            try:
+                import ctypes
+                lang_id = ctypes.windll.kernel32.GetUserDefaultUILanguage()
+                lang = WINDOWS_LANGUAGE_IDS.get(lang_id & 0x3FF)
+                if lang:
+                    return lang
+            except (ImportError, AttributeError, OSError):
+                pass
+            
+            # Fall back to the Python locale
             try:
-                # Get Windows locale
                 default_locale = locale.getdefaultlocale()[0]
                 if default_locale:
                     if default_locale.startswith('fr'):
                         return 'fr'
                     elif default_locale.startswith('en'):
                         return 'en'
-                
-                # Try alternative Windows method with PowerShell
-                try:
-                    result = subprocess.run(['powershell', '-Command', 
-                                           'Get-Culture | Select-Object -ExpandProperty Name'], 
-                                          capture_output=True, text=True, timeout=5)
-                    if result.returncode == 0 and result.stdout.strip():
-                        culture = result.stdout.strip()
-                        if culture.startswith('fr'):
-                            return 'fr'
-                        elif culture.startswith('en'):
-                            return 'en'
-                except (subprocess.TimeoutExpired, subprocess.SubprocessError, OSError):
-                    pass
             except (locale.Error, ValueError):
                 pass
         else:
@@ -84,27 +95,37 @@ def save_language_preference(lang):
         config_dir.mkdir(exist_ok=True)
         
         config_file = config_dir / "language_config.json"
-        config = {"preferred_language": lang}
-        
-        with open(config_file, 'w', encoding='utf-8') as f:
-            json.dump(config, f, ensure_ascii=False, indent=2)
-    except (OSError, PermissionError, json.JSONEncodeError) as e:
+        config_file.write_bytes(json_dumps({"preferred_language": lang}, indent=True))
+    except (OSError, PermissionError, TypeError, ValueError) as e:
         print(f"⚠️  Warning: Could not save language preference: {e}")
+    finally:
+        # Drop the memoized value so the next read sees the new content
+        load_language_preference.cache_clear()
 
+@functools.lru_cache(maxsize=1)
 def load_language_preference():
     """Load the saved language preference"""
     try:
-        config_file = get_config_dir() / "language_config.json"
-        
-        if config_file.exists():
-            with open(config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                return config.get("preferred_language")
-    except (OSError, PermissionError, json.JSONDecodeError):
+        # One read of the raw bytes, no existence check and no text codec
+        config = json_loads((get_config_dir() / "language_config.json").read_bytes())
+        if isinstance(config, dict):
+            return config.get("preferred_language")
+    except (OSError, PermissionError, ValueError):
         pass
     
     return None
 
+def list_chat_scripts(script_dir):
+    """Return the names of the ai_chat_*.py scripts found in script_dir"""
+    # One directory scan instead of an exists() call per candidate script
+    try:
+        return {
+            entry.name for entry in os.scandir(script_dir)
+            if entry.name.startswith("ai_chat_") and entry.name.endswith(".py")
+        }
+    except OSError:
+        return set()
+
 def main():
     parser = argparse.ArgumentParser(description="AI Terminal Chat - Windows Edition")
     parser.add_argument("--lang", choices=['fr', 'en'], help="Force language (fr/en)")
@@ -114,8 +135,6 @@ def main():
     parser.add_argument("--diagnostic", action="store_true", help="Show diagnostic information")
     args, unknown_args = parser.parse_known_args()
     
-    script_dir = Path(__file__).parent
-    
     # Show diagnostic information
     if args.diagnostic:
         print("🔬 AI Terminal Chat - Windows Diagnostic")
@@ -123,6 +142,8 @@ def main():
         print()
         print(f"📋 Platform: {platform.system()} {platform.version()}")
         print(f"📋 Python: {platform.python_version()}")
+        script_dir = Path(__file__).parent
+        present = list_chat_scripts(script_dir)
         print(f"📋 Script location: {script_dir}")
         print(f"📋 Config directory: {get_config_dir()}")
         print(f"📋 Windows helper available: {WINDOWS_HELPER_AVAILABLE}")
@@ -136,8 +157,7 @@ def main():
         # Check script files
         print("\n📁 Available script files:")
         for script_file in ["ai_chat_fr.py", "ai_chat_en.py"]:
-            script_path = script_dir / script_file
-            if script_path.exists():
+            if script_file in present:
                 print(f"   ✅ {script_file}")
             else:
                 print(f"   ❌ {script_file} (missing)")
@@ -149,11 +169,11 @@ def main():
     if args.reset_lang:
         try:
             config_file = get_config_dir() / "language_config.json"
-            if config_file.exists():
-                config_file.unlink()
-                print("✅ Language preference reset. Will auto-detect on next run.")
-            else:
-                print("ℹ️  No language preference was set.")
+            config_file.unlink()
+            load_language_preference.cache_clear()
+            print("✅ Language preference reset. Will auto-detect on next run.")
+        except FileNotFoundError:
+            print("ℹ️  No language preference was set.")
         except (OSError, PermissionError) as e:
             print(f"❌ Error resetting language preference: {e}")
         return
@@ -200,41 +220,50 @@ def main():
                 # Fall back to auto-detection
                 lang = get_system_language()
     
+    script_dir = Path(__file__).parent
+    present = list_chat_scripts(script_dir)
+    
     # Choose the appropriate script
     if lang == 'fr':
-        script_path = script_dir / "ai_chat_fr.py"
-        if not script_path.exists():
+        script_name = "ai_chat_fr.py"
+        if script_name not in present:
             print("❌ French version not found, falling back to English")
-            script_path = script_dir / "ai_chat_en.py"
+            script_name = "ai_chat_en.py"
     else:
-        script_path = script_dir / "ai_chat_en.py"
-        if not script_path.exists():
+        script_name = "ai_chat_en.py"
+        if script_name not in present:
             print("❌ English version not found, falling back to French")
-            script_path = script_dir / "ai_chat_fr.py"
+            script_name = "ai_chat_fr.py"
     
-    if not script_path.exists():
+    if script_name not in present:
         print("❌ No language version found!")
         print("📁 Available files:")
-        for f in script_dir.glob("ai_chat_*.py"):
-            print(f"   {f.name}")
+        for name in sorted(present):
+            print(f"   {name}")
         sys.exit(1)
     
-    # Prepare command arguments
-    cmd = [sys.executable, str(script_path)]
+    script_path = script_dir / script_name
+    
+    # Prepare script arguments
+    script_args = [str(script_path)]
     if args.config:
-        cmd.append("--config")
-    cmd.extend(unknown_args)
+        script_args.append("--config")
+    script_args.extend(unknown_args)
     
-    # Execute the appropriate version
+    # Execute the appropriate version in this interpreter: no second Python
+    # startup, and the modules already imported by the launcher are reused
     try:
-        result = subprocess.run(cmd)
-        return result.returncode
+        import runpy
+        if str(script_dir) not in sys.path:
+            sys.path.insert(0, str(script_dir))
+        sys.argv = script_args
+        runpy.run_path(str(script_path), run_name="__main__")
+        return 0
     except KeyboardInterrupt:
         print("\n💡 Session interrompue par l'utilisateur")
         return 0
     except FileNotFoundError:
-        print(f"❌ Python executable not found: {sys.executable}")
-        print("💡 Make sure Python is properly installed and in PATH")
+        print(f"❌ Script not found: {script_path}")
         return 1
     except Exception as e:
         print(f"❌ Error launching script: {e}")
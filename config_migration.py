@@ -7,6 +7,18 @@ Automatically fixes configuration issues between versions
 import json
 from pathlib import Path
 from datetime import datetime
+from typing import Any
+
+# Use orjson for (de)serialization when it is installed
+try:
+    import orjson
+    json_loads = orjson.loads
+    def json_dumps(obj: Any, indent: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+except ImportError:
+    json_loads = json.loads
+    def json_dumps(obj: Any, indent: bool = False) -> bytes:
+        return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False).encode('utf-8')
 
 def migrate_config():
     """Migrate configuration from old format to new format"""
@@ -18,8 +30,8 @@ def migrate_config():
         return False
     
     try:
-        with open(config_file, 'r') as f:
-            config = json.load(f)
+        with open(config_file, 'rb') as f:
+            config = json_loads(f.read())
         
         changes_made = False
         
@@ -39,12 +51,12 @@ def migrate_config():
         if changes_made:
             # Backup original config
             backup_file = config_dir / f"config_backup_{int(datetime.now().timestamp())}.json"
-            with open(backup_file, 'w') as f:
-                json.dump(config, f, indent=2)
+            with open(backup_file, 'wb') as f:
+                f.write(json_dumps(config, indent=True))
             
             # Save updated config
-            with open(config_file, 'w') as f:
-                json.dump(config, f, indent=2)
+            with open(config_file, 'wb') as f:
+                f.write(json_dumps(config, indent=True))
             
             print("✅ Configuration migrated successfully")
             print(f"📁 Backup saved as: {backup_file.name}")
@@ -57,6 +69,54 @@ def migrate_config():
         print(f"❌ Error migrating configuration: {e}")
         return False
 
+def check_config():
+    """Check the configuration file for common issues
+    
+    Returns {"valid": bool, "issues": [...]}. The result is cached in
+    .check_cache next to the config, keyed on the config's mtime and size, so
+    an unchanged file is not parsed again. Raises FileNotFoundError when
+    there is no configuration file.
+    """
+    config_dir = Path.home() / ".ai_terminal_chat"
+    config_file = config_dir / "config.json"
+    cache_file = config_dir / ".check_cache"
+    
+    st = config_file.stat()
+    key = [st.st_mtime_ns, st.st_size]
+    
+    try:
+        with open(cache_file, 'rb') as f:
+            cached = json_loads(f.read())
+        if cached.get("key") == key:
+            return cached["result"]
+    except (OSError, ValueError, AttributeError, KeyError):
+        pass
+    
+    try:
+        with open(config_file, 'rb') as f:
+            config = json_loads(f.read())
+    except json.JSONDecodeError:
+        result = {"valid": False, "issues": []}
+    else:
+        # Check for common issues
+        issues = []
+        if 'base_url' in config:
+            issues.append("Uses deprecated 'base_url' (should be 'api_url')")
+        if 'api_url' not in config and 'base_url' not in config:
+            issues.append("Missing API URL configuration")
+        if 'api_key' not in config:
+            issues.append("Missing API key")
+        result = {"valid": True, "issues": issues}
+    
+    try:
+        with open(cache_file, 'wb') as f:
+            f.write(json_dumps({"key": key, "result": result}))
+    except OSError:
+        # The cache is only an optimization
+        pass
+    
+    return result
+
 if __name__ == "__main__":
     import argparse
     
@@ -74,26 +134,19 @@ if __name__ == "__main__":
     elif args.check:
         print("🔍 AI Terminal Chat - Configuration Check")
         print("=" * 50)
-        # Implementation for configuration check
-        config_dir = Path.home() / ".ai_terminal_chat"
-        config_file = config_dir / "config.json"
-        
-        if config_file.exists():
-            try:
-                with open(config_file, 'r') as f:
-                    config = json.load(f)
-                
+        try:
+            result = check_config()
+        except FileNotFoundError:
+            print("❌ No configuration file found")
+        except Exception as e:
+            print(f"❌ Error reading configuration: {e}")
+        else:
+            if not result["valid"]:
+                print("❌ Configuration file contains invalid JSON")
+            else:
                 print("✅ Configuration file exists and is valid JSON")
                 
-                # Check for common issues
-                issues = []
-                if 'base_url' in config:
-                    issues.append("Uses deprecated 'base_url' (should be 'api_url')")
-                if 'api_url' not in config and 'base_url' not in config:
-                    issues.append("Missing API URL configuration")
-                if 'api_key' not in config:
-                    issues.append("Missing API key")
-                
+                issues = result["issues"]
                 if issues:
                     print("⚠️  Issues found:")
                     for issue in issues:
@@ -101,12 +154,5 @@ if __name__ == "__main__":
                     print("\n💡 Run with --migrate to fix these issues")
                 else:
                     print("✅ No issues found")
-                    
-            except json.JSONDecodeError:
-                print("❌ Configuration file contains invalid JSON")
-            except Exception as e:
-                print(f"❌ Error reading configuration: {e}")
-        else:
-            print("❌ No configuration file found")
     else:
         parser.print_help()
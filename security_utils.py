@@ -5,22 +5,195 @@ Provides encryption, validation, and rate limiting functionality
 """
 
 import os
+import atexit
 import json
 import base64
 import re
+import hashlib
+import bisect
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Any, Tuple, Optional
-from datetime import datetime, timedelta
+from typing import Dict, Any, List, Tuple, Optional
+from datetime import datetime
 import logging
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+import time
+import threading
+import importlib.util
+
+# cryptography is only imported when something is actually encrypted (see
+# _get_fernet), but a missing install must still fail the import so that
+# callers can detect it and disable the secure features
+if importlib.util.find_spec("cryptography") is None:
+    raise ImportError("security_utils requires the 'cryptography' package")
+
+# Use orjson for (de)serialization when it is installed
+try:
+    import orjson
+    json_loads = orjson.loads
+    def json_dumps(obj: Any, indent: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+except ImportError:
+    json_loads = json.loads
+    def json_dumps(obj: Any, indent: bool = False) -> bytes:
+        return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False).encode('utf-8')
+
+# Token buckets used by check_rate_limit: name -> (limit key, default capacity,
+# window in seconds). The capacity is read from the limit key of rate_limits.json
+# so it stays user-editable; each bucket refills at capacity/window tokens per second.
+RATE_LIMIT_BUCKETS = {
+    "minute": ("minute_limit", 10, 60),
+    "hour": ("hourly_limit", 100, 3600),
+    "day": ("daily_limit", 1000, 86400),
+}
+
+# Minimum delay in seconds between two writes of the rate limits file; state
+# changed in between is written by the next check or at interpreter exit
+RATE_LIMIT_FLUSH_INTERVAL = 5.0
+
+# Command injection patterns rejected by validate_input_safety
+_DANGEROUS_PATTERNS = (
+    r'[;&|`]',  # Command separators
+    r'\$\(',    # Command substitution
+    r'`[^`]*`', # Backtick execution
+    r'eval\s*\(',
+    r'exec\s*\(',
+    r'subprocess',
+    r'os\.system',
+    r'shell=True'
+)
+
+# Fused into a single alternation so one scan replaces eight; each alternative
+# is its own group so a match names its pattern (lastindex), never the input
+_DANGEROUS_RE = re.compile("|".join(f"({pattern})" for pattern in _DANGEROUS_PATTERNS), re.IGNORECASE)
+
+# Use a Hyperscan database (one DFA pass for all patterns) when it is installed
+try:
+    import hyperscan
+    _DANGEROUS_DB = hyperscan.Database()
+    _DANGEROUS_DB.compile(
+        expressions=[pattern.encode() for pattern in _DANGEROUS_PATTERNS],
+        ids=list(range(len(_DANGEROUS_PATTERNS))),
+        elements=len(_DANGEROUS_PATTERNS),
+        flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH] * len(_DANGEROUS_PATTERNS)
+    )
+except Exception:
+    # Not installed, or unusable here (unsupported CPU, broken wheel):
+    # fall back to _DANGEROUS_RE rather than failing the import
+    _DANGEROUS_DB = None
+
+# Hyperscan scratch space cannot be shared between concurrent scans
+_SCAN_STATE = threading.local()
+
+def _find_dangerous_pattern(user_input: str) -> Optional[str]:
+    """Return the first dangerous pattern found in user_input"""
+    if _DANGEROUS_DB is None:
+        match = _DANGEROUS_RE.search(user_input)
+        return _DANGEROUS_PATTERNS[match.lastindex - 1] if match else None
+    
+    scratch = getattr(_SCAN_STATE, "scratch", None)
+    if scratch is None:
+        scratch = _SCAN_STATE.scratch = hyperscan.Scratch(_DANGEROUS_DB)
+    
+    hits = []
+    def on_match(pattern_id, start, end, flags, context):
+        hits.append(pattern_id)
+        return True  # Stop at the first match
+    
+    try:
+        _DANGEROUS_DB.scan(user_input.encode(), match_event_handler=on_match, scratch=scratch)
+    except hyperscan.ScanTerminated:
+        pass
+    return _DANGEROUS_PATTERNS[hits[0]] if hits else None
+
+# Path separators and characters that are invalid in file names
+_SANITIZE_RE = re.compile(r'[<>:"/\\|?*]')
+
+# Expected API key formats per provider: (minimum length, pattern). The length
+# check rejects obviously wrong keys before running the regex
+_API_KEY_PATTERNS = {
+    "openai": (51, re.compile(r"^sk-[a-zA-Z0-9]{48,}$")),
+    "anthropic": (102, re.compile(r"^sk-ant-[a-zA-Z0-9\-]{95,}$")),
+    "groq": (56, re.compile(r"^gsk_[a-zA-Z0-9]{52}$")),
+    "openrouter": (73, re.compile(r"^sk-or-v1-[a-zA-Z0-9]{64}$"))
+}
+
+# Checked by verify_config_integrity
+_REQUIRED_CONFIG_FIELDS = ("llm_type", "model")
+_VALID_LLM_TYPES = frozenset({"ollama", "lmstudio", "openai", "anthropic", "groq", "openrouter"})
+
+# Mask characters sliced by mask_api_key (longer keys fall back to repetition)
+_STARS = "*" * 512
+
+# Separators allowed in keys of unknown providers
+_STRIP_SEP_TABLE = str.maketrans("", "", "-_")
+
+# PBKDF2 iteration count for password-derived keys
+DEFAULT_KDF_ITERATIONS = 100000
+
+# Keys derived by PBKDF2, keyed on (sha256 of the password, salt, iterations)
+# so the plaintext password is never kept as a cache key
+_DERIVED_KEY_CACHE: "OrderedDict[Tuple[str, bytes, int], bytes]" = OrderedDict()
+_DERIVED_KEY_CACHE_SIZE = 8
+_DERIVED_KEY_LOCK = threading.Lock()
+
+def _derive_key(password: str, salt: bytes, iterations: int = DEFAULT_KDF_ITERATIONS) -> bytes:
+    """Run PBKDF2 for password/salt, reusing a recently derived key when possible"""
+    cache_key = (hashlib.sha256(password.encode()).hexdigest(), salt, iterations)
+    with _DERIVED_KEY_LOCK:
+        key = _DERIVED_KEY_CACHE.get(cache_key)
+        if key is not None:
+            _DERIVED_KEY_CACHE.move_to_end(cache_key)
+            return key
+    
+    # hashlib runs the whole loop inside OpenSSL, without holding the GIL
+    key = base64.urlsafe_b64encode(
+        hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations, dklen=32)
+    )
+    with _DERIVED_KEY_LOCK:
+        _DERIVED_KEY_CACHE[cache_key] = key
+        if len(_DERIVED_KEY_CACHE) > _DERIVED_KEY_CACHE_SIZE:
+            _DERIVED_KEY_CACHE.popitem(last=False)
+    return key
+
+_FERNET = None
+
+def _get_fernet():
+    """Return the Fernet class, importing cryptography on first use"""
+    global _FERNET
+    if _FERNET is None:
+        from cryptography.fernet import Fernet
+        _FERNET = Fernet
+    return _FERNET
+
+def _fast_copy(src: Path, dst: Path):
+    """Copy src to dst in the kernel when possible, preserving metadata like shutil.copy2"""
+    import shutil
+    copied = False
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    sent = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if sent == 0:
+                        break
+                    remaining -= sent
+                copied = remaining <= 0
+        except OSError:
+            # Unsupported by the kernel or across these filesystems
+            pass
+    if not copied:
+        # shutil.copyfile already uses sendfile (Linux) or fcopyfile (macOS)
+        shutil.copyfile(src, dst)
+    shutil.copystat(src, dst)
 
 class SecurityManager:
     """Manages security features for AI Terminal Chat"""
     
-    def __init__(self, config_dir: Path):
+    def __init__(self, config_dir: Path, kdf_iterations: int = DEFAULT_KDF_ITERATIONS):
         self.config_dir = config_dir
+        # Data encrypted with one iteration count can only be decrypted with the same count
+        self.kdf_iterations = kdf_iterations
         self.security_config_file = config_dir / "security_config.json"
         self.rate_limit_file = config_dir / "rate_limits.json"
         self.audit_log_file = config_dir / "audit.log"
@@ -30,9 +203,23 @@ class SecurityManager:
         
         # Initialize rate limiting
         self.rate_limits = self.load_rate_limits()
+        self._rate_limits_saved_at = 0.0
+        self._rate_limits_dirty = False
+        atexit.register(self.flush_rate_limits)
+        atexit.register(self.close_audit_log)
         
     def setup_secure_logging(self):
         """Setup secure audit logging"""
+        # Raw append-only descriptor for security events: O_APPEND makes each
+        # os.write an atomic append, without the logging handler machinery.
+        # Opened before basicConfig so a new audit log is created as 0600.
+        try:
+            self._audit_fd = os.open(str(self.audit_log_file), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            if hasattr(os, "fchmod"):
+                os.fchmod(self._audit_fd, 0o600)
+        except OSError:
+            self._audit_fd = None
+        
         logging.basicConfig(
             filename=str(self.audit_log_file),
             level=logging.INFO,
@@ -40,33 +227,51 @@ class SecurityManager:
             datefmt='%Y-%m-%d %H:%M:%S'
         )
         self.logger = logging.getLogger('ai_chat_security')
+    
+    def _fast_audit(self, message: bytes, now: datetime):
+        """Append one INFO entry to the audit log, falling back to the logger"""
+        if self._audit_fd is not None:
+            # Same line layout as the logging format set in setup_secure_logging
+            prefix = now.strftime('%Y-%m-%d %H:%M:%S - INFO - ').encode()
+            try:
+                os.write(self._audit_fd, prefix + message + b"\n")
+                return
+            except OSError:
+                pass
+        # The logger adds the timestamp and level itself
+        self.logger.info(message.decode())
+    
+    def close_audit_log(self):
+        """Close the raw audit log descriptor"""
+        if self._audit_fd is not None:
+            try:
+                os.close(self._audit_fd)
+            except OSError:
+                pass
+            self._audit_fd = None
         
     def generate_key_from_password(self, password: str, salt: Optional[bytes] = None) -> Tuple[bytes, bytes]:
         """Generate encryption key from password"""
         if salt is None:
             salt = os.urandom(16)
         
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
-        return key, salt
+        return _derive_key(password, salt, self.kdf_iterations), salt
+    
+    def _encrypt_with_fernet(self, data: str, fernet: Any, salt: bytes) -> Dict[str, str]:
+        """Encrypt data with an already derived key"""
+        encrypted_data = fernet.encrypt(data.encode())
+        
+        return {
+            "encrypted_data": base64.urlsafe_b64encode(encrypted_data).decode(),
+            "salt": base64.urlsafe_b64encode(salt).decode(),
+            "encryption_method": "fernet_pbkdf2"
+        }
     
     def encrypt_sensitive_data(self, data: str, password: str) -> Dict[str, str]:
         """Encrypt sensitive data like API keys"""
         try:
             key, salt = self.generate_key_from_password(password)
-            fernet = Fernet(key)
-            encrypted_data = fernet.encrypt(data.encode())
-            
-            return {
-                "encrypted_data": base64.urlsafe_b64encode(encrypted_data).decode(),
-                "salt": base64.urlsafe_b64encode(salt).decode(),
-                "encryption_method": "fernet_pbkdf2"
-            }
+            return self._encrypt_with_fernet(data, _get_fernet()(key), salt)
         except Exception as e:
             self.logger.error(f"Encryption failed: {e}")
             raise
@@ -76,7 +281,7 @@ class SecurityManager:
         try:
             salt = base64.urlsafe_b64decode(encrypted_data["salt"])
             key, _ = self.generate_key_from_password(password, salt)
-            fernet = Fernet(key)
+            fernet = _get_fernet()(key)
             
             encrypted_bytes = base64.urlsafe_b64decode(encrypted_data["encrypted_data"])
             decrypted_data = fernet.decrypt(encrypted_bytes)
@@ -88,51 +293,39 @@ class SecurityManager:
     
     def validate_api_key_format(self, api_key: str, provider: str) -> bool:
         """Validate API key format for different providers"""
-        patterns = {
-            "openai": r"^sk-[a-zA-Z0-9]{48,}$",
-            "anthropic": r"^sk-ant-[a-zA-Z0-9\-]{95,}$",
-            "groq": r"^gsk_[a-zA-Z0-9]{52}$",
-            "openrouter": r"^sk-or-v1-[a-zA-Z0-9]{64}$"
-        }
-        
-        pattern = patterns.get(provider.lower())
-        if not pattern:
+        entry = _API_KEY_PATTERNS.get(provider.lower())
+        if not entry:
             # For unknown providers, just check basic format
-            return len(api_key) > 10 and api_key.replace("-", "").replace("_", "").isalnum()
+            return len(api_key) > 10 and api_key.translate(_STRIP_SEP_TABLE).isalnum()
         
-        return bool(re.match(pattern, api_key))
+        min_len, pattern = entry
+        if len(api_key) < min_len:
+            return False
+        return bool(pattern.match(api_key))
     
     def mask_api_key(self, api_key: str) -> str:
         """Mask API key for display"""
-        if len(api_key) <= 8:
-            return "*" * len(api_key)
-        return api_key[:4] + "*" * (len(api_key) - 8) + api_key[-4:]
+        n = len(api_key)
+        if n <= 8:
+            return _STARS[:n]
+        hidden = n - 8
+        stars = _STARS[:hidden] if hidden <= len(_STARS) else "*" * hidden
+        return api_key[:4] + stars + api_key[-4:]
     
     def validate_input_safety(self, user_input: str) -> bool:
         """Validate user input for potential security issues"""
         # Check for command injection patterns
-        dangerous_patterns = [
-            r'[;&|`]',  # Command separators
-            r'\$\(',    # Command substitution
-            r'`[^`]*`', # Backtick execution
-            r'eval\s*\(',
-            r'exec\s*\(',
-            r'subprocess',
-            r'os\.system',
-            r'shell=True'
-        ]
-        
-        for pattern in dangerous_patterns:
-            if re.search(pattern, user_input, re.IGNORECASE):
-                self.logger.warning(f"Dangerous pattern detected in input: {pattern}")
-                return False
+        found = _find_dangerous_pattern(user_input)
+        if found:
+            self.logger.warning(f"Dangerous pattern detected in input: {found}")
+            return False
         
         return True
     
     def sanitize_filename(self, filename: str) -> str:
         """Sanitize filename to prevent path traversal"""
         # Remove path separators and dangerous characters
-        sanitized = re.sub(r'[<>:"/\\|?*]', '_', filename)
+        sanitized = _SANITIZE_RE.sub('_', filename)
         # Remove leading/trailing dots and spaces
         sanitized = sanitized.strip('. ')
         # Limit length
@@ -143,91 +336,116 @@ class SecurityManager:
         """Load rate limiting data"""
         if self.rate_limit_file.exists():
             try:
-                with open(self.rate_limit_file, 'r') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, FileNotFoundError):
+                with open(self.rate_limit_file, 'rb') as f:
+                    rate_limits = json_loads(f.read())
+                if all(
+                    isinstance(rate_limits.get(name), dict) and {"tokens", "last"} <= rate_limits[name].keys()
+                    for name in RATE_LIMIT_BUCKETS
+                ):
+                    for limit_key, default, _ in RATE_LIMIT_BUCKETS.values():
+                        rate_limits.setdefault(limit_key, default)
+                    return rate_limits
+                # Files from older versions hold the list of request times
+                if isinstance(rate_limits.get("requests"), list):
+                    return self.upgrade_rate_limits(rate_limits["requests"], rate_limits)
+            except (json.JSONDecodeError, FileNotFoundError, AttributeError):
                 pass
         
-        return {
-            "requests": [],
-            "daily_limit": 1000,
-            "hourly_limit": 100,
-            "minute_limit": 10
-        }
+        return self.upgrade_rate_limits([])
+    
+    def upgrade_rate_limits(self, requests: List[Any], limits: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Build bucket state from a list of past request times (ISO strings or epoch floats),
+        keeping the limit values of the old file"""
+        limits = limits or {}
+        timestamps = []
+        for req_time in requests:
+            try:
+                if isinstance(req_time, str):
+                    timestamps.append(datetime.fromisoformat(req_time).timestamp())
+                else:
+                    timestamps.append(float(req_time))
+            except (TypeError, ValueError):
+                continue
+        
+        # Each past request still inside a window holds one token of that bucket;
+        # on the sorted list each window count is a single binary search
+        timestamps.sort()
+        now = time.time()
+        rate_limits = {}
+        for name, (limit_key, default, window) in RATE_LIMIT_BUCKETS.items():
+            capacity = limits.get(limit_key, default)
+            rate_limits[limit_key] = capacity
+            used = len(timestamps) - bisect.bisect_right(timestamps, now - window)
+            rate_limits[name] = {"tokens": float(max(0, capacity - used)), "last": now}
+        return rate_limits
     
     def save_rate_limits(self):
         """Save rate limiting data"""
         try:
-            with open(self.rate_limit_file, 'w') as f:
-                json.dump(self.rate_limits, f, indent=2)
+            with open(self.rate_limit_file, 'wb') as f:
+                f.write(json_dumps(self.rate_limits, indent=True))
+            self._rate_limits_saved_at = time.time()
+            self._rate_limits_dirty = False
         except Exception as e:
             self.logger.error(f"Failed to save rate limits: {e}")
     
+    def flush_rate_limits(self):
+        """Write rate limiting data if a save was deferred"""
+        if self._rate_limits_dirty:
+            self.save_rate_limits()
+    
     def check_rate_limit(self, limit_type: str = "request") -> bool:
         """Check if rate limit is exceeded"""
-        now = datetime.now()
-        
-        # Clean old requests
-        self.rate_limits["requests"] = [
-            req_time for req_time in self.rate_limits["requests"]
-            if datetime.fromisoformat(req_time) > now - timedelta(days=1)
-        ]
-        
-        # Count requests in different time windows
-        hour_ago = now - timedelta(hours=1)
-        minute_ago = now - timedelta(minutes=1)
-        
-        recent_requests = [
-            datetime.fromisoformat(req_time) 
-            for req_time in self.rate_limits["requests"]
-        ]
-        
-        hourly_count = sum(1 for req_time in recent_requests if req_time > hour_ago)
-        minute_count = sum(1 for req_time in recent_requests if req_time > minute_ago)
-        daily_count = len(recent_requests)
-        
-        # Check limits
-        if daily_count >= self.rate_limits["daily_limit"]:
-            self.logger.warning("Daily rate limit exceeded")
-            return False
-        
-        if hourly_count >= self.rate_limits["hourly_limit"]:
-            self.logger.warning("Hourly rate limit exceeded")
-            return False
-        
-        if minute_count >= self.rate_limits["minute_limit"]:
-            self.logger.warning("Minute rate limit exceeded")
-            return False
+        # Wall-clock time rather than monotonic: the buckets are persisted and
+        # must keep refilling between runs
+        now = time.time()
+        
+        # Refill every bucket for the time elapsed since its last update
+        for name, (limit_key, _, window) in RATE_LIMIT_BUCKETS.items():
+            capacity = self.rate_limits[limit_key]
+            bucket = self.rate_limits[name]
+            elapsed = max(0.0, now - bucket["last"])
+            bucket["tokens"] = min(float(capacity), bucket["tokens"] + elapsed * capacity / window)
+            bucket["last"] = now
+        
+        # Check limits, widest window first
+        for name in ("day", "hour", "minute"):
+            if self.rate_limits[name]["tokens"] < 1:
+                self.logger.warning(f"{name.capitalize()} rate limit exceeded")
+                return False
         
         # Record this request
-        self.rate_limits["requests"].append(now.isoformat())
-        self.save_rate_limits()
+        for name in RATE_LIMIT_BUCKETS:
+            self.rate_limits[name]["tokens"] -= 1
+        if now - self._rate_limits_saved_at >= RATE_LIMIT_FLUSH_INTERVAL:
+            self.save_rate_limits()
+        else:
+            self._rate_limits_dirty = True
         
         return True
     
     def log_security_event(self, event_type: str, details: Dict[str, Any]):
         """Log security-related events"""
+        now = datetime.now()
         event = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now.isoformat(),
             "event_type": event_type,
             "details": details
         }
         
-        self.logger.info(f"Security event: {json.dumps(event)}")
+        self._fast_audit(b"Security event: " + json_dumps(event), now)
     
     def verify_config_integrity(self, config_data: Dict[str, Any]) -> bool:
         """Verify configuration file integrity"""
-        required_fields = ["llm_type", "model"]
-        
-        for field in required_fields:
+        for field in _REQUIRED_CONFIG_FIELDS:
             if field not in config_data:
                 self.logger.error(f"Missing required field in config: {field}")
                 return False
         
-        # Validate LLM type
-        valid_llm_types = ["ollama", "lmstudio", "openai", "anthropic", "groq", "openrouter"]
-        if config_data["llm_type"] not in valid_llm_types:
-            self.logger.error(f"Invalid LLM type: {config_data['llm_type']}")
+        # Validate LLM type (a hand-edited file may hold an unhashable value)
+        llm_type = config_data["llm_type"]
+        if not isinstance(llm_type, str) or llm_type not in _VALID_LLM_TYPES:
+            self.logger.error(f"Invalid LLM type: {llm_type}")
             return False
         
         return True
@@ -241,8 +459,7 @@ class SecurityManager:
         backup_path = file_path.parent / f"{file_path.stem}_backup_{timestamp}{file_path.suffix}"
         
         try:
-            import shutil
-            shutil.copy2(file_path, backup_path)
+            _fast_copy(file_path, backup_path)
             self.logger.info(f"Secure backup created: {backup_path}")
             return backup_path
         except Exception as e:
@@ -257,20 +474,25 @@ class SecureConfigManager:
         self.security_manager = security_manager
         self.secure_config_file = config_dir / "secure_config.json"
         
-    def save_secure_config(self, config: Dict[str, Any], master_password: str):
-        """Save configuration with encrypted sensitive data"""
+    def save_secure_config(self, config: Dict[str, Any], master_password: str,
+                           path: Optional[Path] = None):
+        """Save configuration with encrypted sensitive data (to secure_config_file by default)"""
+        if path is None:
+            path = self.secure_config_file
         secure_config = config.copy()
         
         # Encrypt sensitive fields
         sensitive_fields = ["api_key", "password", "token"]
         
+        # One salt and key for the whole config (Fernet uses a fresh IV per token)
+        key, salt = self.security_manager.generate_key_from_password(master_password)
+        fernet = _get_fernet()(key)
+        secure_config["_kdf_salt"] = base64.urlsafe_b64encode(salt).decode()
+        
         for field in sensitive_fields:
             if field in secure_config and secure_config[field]:
                 try:
-                    encrypted_data = self.security_manager.encrypt_sensitive_data(
-                        secure_config[field], master_password
-                    )
-                    secure_config[f"{field}_encrypted"] = encrypted_data
+                    secure_config[f"{field}_encrypted"] = fernet.encrypt(secure_config[field].encode()).decode()
                     del secure_config[field]  # Remove plaintext
                 except Exception as e:
                     self.security_manager.logger.error(f"Failed to encrypt {field}: {e}")
@@ -279,8 +501,8 @@ class SecureConfigManager:
         secure_config["encrypted_timestamp"] = datetime.now().isoformat()
         
         try:
-            with open(self.secure_config_file, 'w') as f:
-                json.dump(secure_config, f, indent=2)
+            with open(path, 'wb') as f:
+                f.write(json_dumps(secure_config, indent=True))
             
             self.security_manager.log_security_event("config_encrypted", {
                 "fields_encrypted": len([f for f in sensitive_fields if f"{f}_encrypted" in secure_config])
@@ -289,30 +511,62 @@ class SecureConfigManager:
             self.security_manager.logger.error(f"Failed to save secure config: {e}")
             raise
     
+    def save_many(self, configs: List[Tuple[Dict[str, Any], str, Path]], max_workers: Optional[int] = None):
+        """Encrypt and save several (config, master_password, path) entries in parallel
+        
+        Each entry has its own salt, so the key derivations are independent;
+        PBKDF2 releases the GIL and the threads run them on separate cores.
+        The first failure is re-raised once all entries have been attempted.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
+        with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+            futures = [executor.submit(self.save_secure_config, *entry) for entry in configs]
+        
+        for future in futures:
+            future.result()
+    
     def load_secure_config(self, master_password: str) -> Dict[str, Any]:
         """Load and decrypt configuration"""
         if not self.secure_config_file.exists():
             return {}
         
         try:
-            with open(self.secure_config_file, 'r') as f:
-                secure_config = json.load(f)
+            with open(self.secure_config_file, 'rb') as f:
+                secure_config = json_loads(f.read())
             
             # Decrypt sensitive fields
             sensitive_fields = ["api_key", "password", "token"]
             
+            # Configs saved with a shared salt derive the key once; older ones
+            # store a salt per field and go through decrypt_sensitive_data
+            fernet = None
+            if "_kdf_salt" in secure_config:
+                salt = base64.urlsafe_b64decode(secure_config["_kdf_salt"])
+                key, _ = self.security_manager.generate_key_from_password(master_password, salt)
+                fernet = _get_fernet()(key)
+            
+            failed = False
             for field in sensitive_fields:
                 encrypted_field = f"{field}_encrypted"
                 if encrypted_field in secure_config:
                     try:
-                        decrypted_data = self.security_manager.decrypt_sensitive_data(
-                            secure_config[encrypted_field], master_password
-                        )
+                        encrypted_data = secure_config[encrypted_field]
+                        if isinstance(encrypted_data, dict):
+                            decrypted_data = self.security_manager.decrypt_sensitive_data(
+                                encrypted_data, master_password
+                            )
+                        else:
+                            decrypted_data = fernet.decrypt(encrypted_data.encode()).decode()
                         secure_config[field] = decrypted_data
                         del secure_config[encrypted_field]  # Remove encrypted version
                     except Exception as e:
                         self.security_manager.logger.error(f"Failed to decrypt {field}: {e}")
-                        # Keep encrypted field for debugging
+                        # Keep encrypted field (and its salt) for debugging
+                        failed = True
+            
+            if not failed:
+                secure_config.pop("_kdf_salt", None)
             
             return secure_config
             
@@ -336,15 +590,26 @@ if __name__ == "__main__":
         issues = []
         warnings = []
         
+        # One directory listing answers every existence check below
+        stat_info = None
+        entries = None
+        try:
+            stat_info = config_dir.stat()
+            entries = {entry.name for entry in os.scandir(config_dir)}
+        except FileNotFoundError:
+            entries = set()
+        except OSError as e:
+            issues.append(f"Configuration directory cannot be read: {e}")
+        
         # Check if config directory exists
-        if not config_dir.exists():
-            issues.append("Configuration directory does not exist")
+        if stat_info is None:
+            if entries is not None:
+                issues.append("Configuration directory does not exist")
         else:
             print("✅ Configuration directory exists")
         
         # Check file permissions
-        if config_dir.exists():
-            stat_info = config_dir.stat()
+        if stat_info is not None:
             if stat_info.st_mode & 0o077:
                 warnings.append(f"Configuration directory permissions too open: {oct(stat_info.st_mode)}")
             else:
@@ -362,13 +627,17 @@ if __name__ == "__main__":
             issues.append("Cryptography library not installed")
         
         # Check audit log
-        if security_manager.audit_log_file.exists():
+        if entries is None:
+            warnings.append("Audit log file could not be checked (configuration directory unreadable)")
+        elif security_manager.audit_log_file.name in entries:
             print("✅ Audit log file exists")
         else:
             warnings.append("Audit log file does not exist (will be created on first use)")
         
         # Check rate limits file
-        if security_manager.rate_limit_file.exists():
+        if entries is None:
+            warnings.append("Rate limits file could not be checked (configuration directory unreadable)")
+        elif security_manager.rate_limit_file.name in entries:
             print("✅ Rate limits file exists")
         else:
             warnings.append("Rate limits file does not exist (will be created on first use)")
@@ -8,17 +8,20 @@ import os
 import platform
 from pathlib import Path
 
+# The platform and its config location cannot change within a process
+_IS_WINDOWS = platform.system() == "Windows"
+_LOCALAPPDATA = os.environ.get('LOCALAPPDATA') if _IS_WINDOWS else None
+
 def is_windows():
     """Check if running on Windows"""
-    return platform.system() == "Windows"
+    return _IS_WINDOWS
 
 def get_config_directory():
     """Get the appropriate configuration directory for the platform"""
     if is_windows():
         # Use LOCALAPPDATA on Windows
-        local_appdata = os.environ.get('LOCALAPPDATA')
-        if local_appdata:
-            return Path(local_appdata) / "ai_terminal_chat"
+        if _LOCALAPPDATA:
+            return Path(_LOCALAPPDATA) / "ai_terminal_chat"
         else:
             # Fallback to USERPROFILE
             return Path(os.environ['USERPROFILE']) / "ai_terminal_chat"